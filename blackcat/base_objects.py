@@ -4,13 +4,24 @@ Defines the BaseDevice class, which serves as a base class for external devices.
 It provides common attributes and enforces the presence of a `setup()` method in derived classes.
 """
 
-import configparser
 import logging
+import os
+from collections.abc import Sequence
 from importlib.resources import files
 from pathlib import Path
 
 from blackcat.logger import configure_logging
-from blackcat.utils import get_default_config_path
+from blackcat.utils import (
+    _load_config,
+    get_default_config_path,
+    run_shell_script,
+)
+
+# Locate the scripts directory within the package once, at import time.
+try:
+    _SCRIPTS_DIR = files("blackcat.scripts")
+except ModuleNotFoundError:
+    _SCRIPTS_DIR = None
 
 
 class BaseDevice:
@@ -43,25 +54,42 @@ class BaseDevice:
             FileNotFoundError: If the configuration file does not exist.
             ValueError: If an invalid logging level is provided.
         """
-        # Initialize logger for this class
-        if not hasattr(logging, logging_level.upper()):
+        self._init_logging(logging_level)
+
+        # Scripts directory within the package, located at import time
+        if _SCRIPTS_DIR is None:
+            self.logger.error("INIT: Failed to locate 'blackcat.scripts'.")
+            raise RuntimeError("'blackcat.scripts' package not found.")
+        self.scripts_dir = _SCRIPTS_DIR
+        self.logger.debug(
+            "INIT: Located scripts directory: %s", self.scripts_dir
+        )
+
+        self._init_config(config_file)
+        self._init_save_path(save_path)
+
+    def _init_logging(self, logging_level: str) -> None:
+        """Configure logging and create the logger for this class.
+
+        Raises
+        ------
+            ValueError: If an invalid logging level is provided.
+        """
+        level = getattr(logging, logging_level.upper(), None)
+        if not isinstance(level, int):
             raise ValueError(
                 f"Invalid logging level: {logging_level}. Use 'INFO', 'DEBUG', etc."
             )
-        logging_level = getattr(logging, logging_level.upper())
-        configure_logging(level=logging_level)
+        configure_logging(level=level)
         self.logger = logging.getLogger(self.__class__.__name__)
 
-        # Locate the scripts directory within the package
-        try:
-            self.scripts_dir = files("blackcat.scripts")
-            self.logger.debug(
-                f"INIT: Located scripts directory: {self.scripts_dir}"
-            )
-        except ModuleNotFoundError as e:
-            self.logger.error(f"INIT: Failed to locate 'blackcat.scripts': {e}")
-            raise RuntimeError("'blackcat.scripts' package not found.")
+    def _init_config(self, config_file: str | None) -> None:
+        """Locate and load the configuration file.
 
+        Raises
+        ------
+            FileNotFoundError: If the configuration file does not exist.
+        """
         # Use the default config file if none is provided
         if config_file is None:
             self.config_file = get_default_config_path()
@@ -69,36 +97,57 @@ class BaseDevice:
         else:
             self.config_file = Path(config_file).resolve()
             self.logger.debug(
-                "INIT: Using user-provided configuration file: "
-                f"{self.config_file}"
+                "INIT: Using user-provided configuration file: %s",
+                self.config_file,
             )
 
-        # Read the config file
-        self.config = configparser.ConfigParser()
-        if not self.config_file.exists():
+        # Read the config file. The parsed content is cached as long as the
+        # file is not modified.
+        try:
+            mtime_ns = self.config_file.stat().st_mtime_ns
+        except FileNotFoundError:
             self.logger.error(
-                f"INIT: Configuration file '{self.config_file}' does not exist."
+                "INIT: Configuration file '%s' does not exist.",
+                self.config_file,
             )
             raise FileNotFoundError(
                 f"Configuration file '{self.config_file}' does not exist."
             )
-        self.config.read(self.config_file)
+        self._config_file_str = str(self.config_file)
+        self.config = _load_config(self._config_file_str, mtime_ns)
         self.logger.debug(
-            f"INIT: Loaded configuration from: {self.config_file}"
+            "INIT: Loaded configuration from: %s", self.config_file
         )
 
+    def _init_save_path(self, save_path: str | None) -> None:
+        """Resolve the save path.
+
+        The directory itself is only created by `_ensure_save_path`, when
+        something is first written to it.
+        """
         # Check if a save_path was specified. Otherwise fall back to default.
         self._save_path: Path = Path(
             save_path or self.DEFAULT_SAVE_PATH
         ).resolve()
-        if not self.save_path.exists():
-            self.save_path.mkdir(parents=True, exist_ok=True)
-            self.logger.debug(f"INIT: Created save directory: {self.save_path}")
-        else:
+        self._update_cached_paths()
+        self._save_path_ready = False
+
+    def _ensure_save_path(self) -> None:
+        """Create the save directory if this has not been done yet."""
+        if self._save_path_ready:
+            return
+        try:
+            self.save_path.mkdir(parents=True)
+            self.logger.debug(
+                "SAVE PATH: Created save directory: %s", self.save_path
+            )
+        except FileExistsError:
             self.logger.warning(
-                f"INIT: Save directory already exists: {self.save_path}. "
-                "You might be overwriting files!"
+                "SAVE PATH: Save directory already exists: %s. "
+                "You might be overwriting files!",
+                self.save_path,
             )
+        self._save_path_ready = True
 
     @property
     def save_path(self) -> Path:
@@ -114,7 +163,47 @@ class BaseDevice:
         except Exception as e:
             raise ValueError(f"Failed to create save path '{new_path}': {e}")
         self._save_path = new_path
-        self.logger.info(f"Save path updated to: {self._save_path}")
+        self._save_path_ready = True
+        self._update_cached_paths()
+        self.logger.info("Save path updated to: %s", self._save_path)
+
+    def _update_cached_paths(self) -> None:
+        """Cache the paths derived from `save_path`.
+
+        Called whenever `save_path` changes, so that the methods running
+        scripts and listeners do not rebuild them on every call.
+        """
+        self._save_path_str = str(self._save_path)
+        # Template for the data output files, filled in with the file tag.
+        self._data_path_template = self._save_path_str + os.sep + "data_{}.bin"
+
+    def _script_path(self, section: str, key: str) -> str:
+        """Return the full path of the script named in the config file.
+
+        Raises
+        ------
+            KeyError: If the section or key is missing in the config file.
+        """
+        return (self.scripts_dir / self.config[section][key]).as_posix()
+
+    def _run_script(
+        self,
+        script: str,
+        arguments: Sequence[str] = (),
+        process_name: str = "",
+    ) -> None:
+        """Run one of the scripts, logging to this device's logger.
+
+        Raises
+        ------
+            subprocess.CalledProcessError: If the script fails.
+        """
+        run_shell_script(
+            script,
+            arguments=arguments,
+            logger=self.logger,
+            process_name=process_name,
+        )
 
     def setup(self) -> None:
         """Set up the TDC system.
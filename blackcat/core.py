@@ -4,14 +4,51 @@ It includes classes and methods to set up, calibrate, and manage the
 BlackCat system, as well as interact with external USB devices.
 """
 
+import hashlib
+import json
+import logging
 import os
+import shutil
 import subprocess
+import threading
 import time
 from pathlib import Path
 
 from blackcat.base_objects import BaseDevice
-from blackcat.data_processing import process_raw_cal
-from blackcat.utils import UDPListener, USBReader, run_shell_script
+from blackcat.data_processing import CAL_FORMAT_VERSION, process_raw_cal
+from blackcat.utils import UDPListener, USBReader
+
+# Starts of the `dog discover` lines that do not describe a module: the
+# table header and its separator.
+_DISCOVER_HEADERS = (b"IP-ADDR", b"---")
+
+
+def _count_modules(output: bytes) -> int:
+    """Count the modules listed in the output of `dog discover`.
+
+    Every non-blank line is a module, except the table header and its
+    separator.
+    """
+    return sum(
+        1
+        for line in output.splitlines()
+        if line.strip() and not line.startswith(_DISCOVER_HEADERS)
+    )
+
+
+def _file_sha256(path: str) -> str:
+    """Return the SHA-256 hex digest of the content of a file."""
+    with open(path, "rb") as f:
+        return hashlib.file_digest(f, "sha256").hexdigest()
+
+
+def _stat_key(path: str) -> list[int] | None:
+    """Return the size and mtime of a file, or None if it does not exist."""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return [st.st_size, st.st_mtime_ns]
 
 
 class BlackCat(BaseDevice):
@@ -22,6 +59,22 @@ class BlackCat(BaseDevice):
     measurements.
     """
 
+    # Seconds to wait for all the UDP listeners to bind their sockets.
+    LISTENER_READY_TIMEOUT = 5.0
+    # Seconds after which a hanging `dog discover` is killed.
+    DOG_DISCOVER_TIMEOUT = 10.0
+    # Seconds to wait after the ping of death before polling the modules:
+    # until they have actually gone down, `dog discover` still lists them.
+    REBOOT_SETTLE_TIME = 5.0
+    # Seconds to wait for all modules to come back online after a reboot.
+    REBOOT_RECOVERY_TIMEOUT = 30.0
+    # Seconds for which a `status()` result is reused instead of running
+    # `dog discover` again.
+    STATUS_CACHE_TTL = 0.1
+    # Index of the processed raw calibration files, in the calibration
+    # output directory.
+    CAL_CACHE_FILE = ".cache.json"
+
     def __init__(
         self,
         config_file: str | None = None,
@@ -44,40 +97,86 @@ class BlackCat(BaseDevice):
         ------
             FileNotFoundError: If the configuration file does not exist.
             ValueError: If an invalid logging level is provided.
+            KeyError: If a required key is missing from the "setup" section
+                of the configuration file.
         """
         super().__init__(config_file, save_path, logging_level)
+        self._parse_config()
+
+        # Last `status()` result as (time, expected_count, result). The lock
+        # makes concurrent callers share a single `dog discover` run.
+        self._status_lock = threading.Lock()
+        self._status_cache: tuple[float, int, bool] | None = None
+        # `dog` is looked up in PATH once. With its full path (and
+        # close_fds=False) subprocess can spawn it with posix_spawn.
+        self._dog_discover_cmd: tuple[str, ...] = (
+            shutil.which("dog") or "dog",
+            "discover",
+        )
 
         if dog_modules:
-            # Check if DOGMA_BROADCAST_ADDRESS is already set
-            if "DOGMA_BROADCAST_ADDRESS" not in os.environ:
-                os.environ["DOGMA_BROADCAST_ADDRESS"] = self.config["setup"][
-                    "broadcast_address"
-                ]
-                print(
-                    "DOGMA_BROADCAST_ADDRESS was not set. Setting it to:",
-                    os.environ["DOGMA_BROADCAST_ADDRESS"],
-                )
-            else:
-                print(
-                    "DOGMA_BROADCAST_ADDRESS is already set to:",
-                    os.environ["DOGMA_BROADCAST_ADDRESS"],
-                )
-
-            # Number of modules we expect to be online.
-            self.expected_count = len(
-                self.config["setup"]["tomcat_ids"].split()
-            ) + len(self.config["setup"]["tdc_ids"].split())
+            # Set DOGMA_BROADCAST_ADDRESS, unless it is already set
+            broadcast_address = os.environ.setdefault(
+                "DOGMA_BROADCAST_ADDRESS",
+                self.config["setup"]["broadcast_address"],
+            )
+            self.logger.info(
+                "INIT: DOGMA_BROADCAST_ADDRESS is set to: %s", broadcast_address
+            )
 
             # Check what dog devices are visible
             self.status(self.expected_count, verbose=True)
 
         self.listeners: dict[str, UDPListener] | None = None
 
-    def setup(self, verbose: bool = False) -> None:
+    def _parse_config(self) -> None:
+        """Snapshot the module IDs from the "setup" section.
+
+        They are then not looked up and split again on every call. The
+        other sections are only read by the methods using them.
+
+        Raises
+        ------
+            KeyError: If a required key is missing from the "setup" section
+                of the configuration file.
+        """
+        self._tomcat_ids: tuple[str, ...] = tuple(
+            self.config["setup"]["tomcat_ids"].split()
+        )
+        self._tdc_ids: tuple[str, ...] = tuple(
+            self.config["setup"]["tdc_ids"].split()
+        )
+        self._setup_args: tuple[str, ...] = (
+            "--config_file",
+            self._config_file_str,
+        )
+
+        # Number of modules we expect to be online.
+        self.expected_count = len(self._tomcat_ids) + len(self._tdc_ids)
+
+    def _update_cached_paths(self) -> None:
+        """Cache the paths derived from `save_path`."""
+        super()._update_cached_paths()
+        self._cal_args: tuple[str, ...] = (
+            "--config_file",
+            self._config_file_str,
+            "--save_path",
+            self._save_path_str,
+        )
+
+    def setup(self, verbose: bool = False, reassert_only: bool = False) -> None:
         """Set up everything.
 
         Assigns IDs and broadcast bits to all modules.
 
+        Args:
+            verbose (bool, optional): If True, adds a '--verbose' argument
+                to the script. Defaults to False.
+            reassert_only (bool, optional): If True, skip assigning the
+                IDs and broadcast bits, which the calibration does not
+                change, and only configure the DLMs and the TDCs again.
+                Defaults to False.
+
         Raises
         ------
             KeyError: If the "setup" section or "script" key is missing in
@@ -85,22 +184,15 @@ class BlackCat(BaseDevice):
         """
         self.logger.info("SETUP: Starting the setup process...")
 
-        # Read the script name from the config file
-        script_name = self.config["setup"]["script"]
+        script = self._script_path("setup", "script")
 
-        # Construct the full path to the script using the dynamically located scripts_dir
-        script = self.scripts_dir / script_name
-
-        arguments = ["--config_file", str(self.config_file)]
+        arguments = self._setup_args
         if verbose:
-            arguments = ["--verbose"]
+            arguments += ("--verbose",)
+        if reassert_only:
+            arguments += ("--reassert_only",)
 
-        run_shell_script(
-            script.as_posix(),
-            arguments=arguments,
-            logger=self.logger,
-            process_name="SETUP",
-        )
+        self._run_script(script, arguments, process_name="SETUP")
         self.logger.info("SETUP: DONE.")
 
     def calibrate(self, verbose: bool = False) -> None:
@@ -122,30 +214,21 @@ class BlackCat(BaseDevice):
         """
         self.logger.info("CALIBRATION: Starting the calibration process...")
 
-        # Read the script name from the config file
-        script_name = self.config["calibration"]["script"]
-
-        # Construct the full path to the script using the dynamically located scripts_dir
-        script = self.scripts_dir / script_name
+        script = self._script_path("calibration", "script")
 
-        arguments = [
-            "--config_file",
-            str(self.config_file),
-            "--save_path",
-            str(self.save_path),
-        ]
+        arguments = self._cal_args
         if verbose:
-            arguments.append("--verbose")
+            arguments += ("--verbose",)
 
-        run_shell_script(
-            script.as_posix(),
-            arguments=arguments,
-            logger=self.logger,
-            process_name="CALIBRATION",
-        )
+        # The calibration script writes into the save directory
+        self._ensure_save_path()
+
+        self._run_script(script, arguments, process_name="CALIBRATION")
         self.logger.info("CALIBRATION: DONE.")
 
-    def process_raw_calibration(self, verbose: bool = False) -> None:
+    def process_raw_calibration(
+        self, verbose: bool = False, force: bool = False
+    ) -> None:
         """Process raw calibration files.
 
         Ensures that the output directory for calibration files exists,
@@ -154,9 +237,16 @@ class BlackCat(BaseDevice):
         format (`tdc_cal_<id>`). The processed files are stored in the
         specified calibration output directory.
 
+        The SHA-256 of each processed raw file is kept in `CAL_CACHE_FILE`
+        in the same directory. Raw files whose content did not change since
+        their calibration file was written are not processed again. Raw
+        files whose size and mtime did not change are not even hashed.
+
         Args:
             verbose (bool, optional): If True, logs additional information
                 about the calibration processing. Defaults to False.
+            force (bool, optional): If True, process all the raw files
+                regardless of the cache. Defaults to False.
 
         Raises
         ------
@@ -165,24 +255,101 @@ class BlackCat(BaseDevice):
         """
         # Make sure a 'calibration' folder exists. We put there the output
         # calibration files.
-        cal_path = self.save_path / self.config["calibration"]["out_dir"]
+        cal_path = self._save_path / self.config["calibration"]["out_dir"]
         if not cal_path.exists():
             raise FileNotFoundError(
                 f"CALIBRATION: The expected calibration directory does not exist: {cal_path}"
             )
         self.logger.debug(
-            f"CALIBRATION: Using existing calibration directory: {cal_path}"
+            "CALIBRATION: Using existing calibration directory: %s", cal_path
         )
 
         self.logger.info("CALIBRATION: Get human readable calibration files.")
 
-        tdc_ids = self.config["setup"]["tdc_ids"].split()
-        print("\n############################################################")
-        for id in tdc_ids:
-            raw_cal_file = cal_path / f"rc_{id}"
-            cal_file = cal_path / f"tdc_cal_{id}"
-            process_raw_cal(raw_cal_file, cal_file, verbose=verbose)
-        print("############################################################\n")
+        cal_dir = str(cal_path) + os.sep
+        cache_file = cal_dir + self.CAL_CACHE_FILE
+        cache = {} if force else self._load_cal_cache(cache_file)
+
+        # Select the raw files that changed since they were last processed.
+        todo: list[tuple[str, str, str, str | None, list[int] | None]] = []
+        cache_changed = False
+        for tdc_id in self._tdc_ids:
+            raw_cal_file = f"{cal_dir}rc_{tdc_id}"
+            cal_file = f"{cal_dir}tdc_cal_{tdc_id}"
+            raw_stat = _stat_key(raw_cal_file)
+            digest = None
+            entry = cache.get(tdc_id)
+            if (
+                raw_stat is not None
+                and entry is not None
+                and entry["cal"] == _stat_key(cal_file)
+            ):
+                # Only hash the raw file if its size or mtime changed.
+                if entry.get("raw") == raw_stat:
+                    digest = entry["sha256"]
+                else:
+                    digest = _file_sha256(raw_cal_file)
+                    if digest == entry["sha256"]:
+                        # Same content: remember the new mtime.
+                        entry["raw"] = raw_stat
+                        cache_changed = True
+                if digest == entry["sha256"]:
+                    self.logger.debug(
+                        "CALIBRATION: %s is up to date, skipping.", cal_file
+                    )
+                    continue
+            elif raw_stat is not None:
+                digest = _file_sha256(raw_cal_file)
+            # A missing raw file is reported by process_raw_cal.
+            todo.append((tdc_id, raw_cal_file, cal_file, digest, raw_stat))
+
+        try:
+            for tdc_id, raw_cal_file, cal_file, digest, raw_stat in todo:
+                process_raw_cal(raw_cal_file, cal_file, verbose)
+                # Record each file as soon as it is processed, so that an
+                # error on a later file does not lose it.
+                if digest is not None:
+                    cache[tdc_id] = {
+                        "sha256": digest,
+                        "raw": raw_stat,
+                        "cal": _stat_key(cal_file),
+                    }
+                    cache_changed = True
+        finally:
+            if cache_changed:
+                self._save_cal_cache(cache_file, cache)
+        self.logger.info("CALIBRATION: Calibration files processed.")
+
+    def _load_cal_cache(self, cache_file: str) -> dict:
+        """Read the index of processed raw calibration files.
+
+        Returns an empty index if the file is missing, unreadable, or was
+        written for another version of the calibration output format.
+        """
+        try:
+            with open(cache_file) as f:
+                cache = json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            self.logger.debug(
+                "CALIBRATION: Ignoring unreadable cache %s: %s", cache_file, e
+            )
+            return {}
+        if (
+            not isinstance(cache, dict)
+            or cache.get("version") != CAL_FORMAT_VERSION
+        ):
+            return {}
+        return cache.get("files", {})
+
+    def _save_cal_cache(self, cache_file: str, cache: dict) -> None:
+        """Write the index of processed raw calibration files."""
+        tmp_file = cache_file + ".tmp"
+        with open(tmp_file, "w") as f:
+            json.dump({"version": CAL_FORMAT_VERSION, "files": cache}, f)
+        # Replace the old index in one step, so it is never half written.
+        os.replace(tmp_file, cache_file)
 
     def setup_and_calibrate(self, verbose: bool = False) -> None:
         """Run self.setup() and self.calibrate() one after the other.
@@ -194,47 +361,90 @@ class BlackCat(BaseDevice):
         self.setup(verbose=verbose)
         self.calibrate(verbose=verbose)
         # To make sure everything is ok, we setup again after calibration.
-        self.setup(verbose=verbose)
+        # The module IDs are still in place, so they are not assigned again.
+        self.setup(verbose=verbose, reassert_only=True)
 
-    def start_udp_listeners(self, outfile_suffix: str | None = None) -> None:
+    def start_udp_listeners(
+        self, outfile_suffix: str | None = None, post_bind_delay: float = 0.0
+    ) -> None:
         """Start the UDP listeners for the specified ports.
 
         This method reads the port configuration from the config file and
         starts a UDP listener for each port. The listeners are stored in
         the `self.listeners` dictionary.
 
+        Args:
+            outfile_suffix (str, optional): Suffix for the output file names,
+                `data_<tdc>_<suffix>.bin`. Defaults to None.
+            post_bind_delay (float, optional): Extra time in seconds to wait,
+                once, after all listeners are ready. Defaults to 0.
+
         Raises
         ------
             KeyError: If the "run" section or "ports" key is missing in
                 the config file.
+            RuntimeError: If a listener is not ready within
+                `LISTENER_READY_TIMEOUT` seconds.
+            OSError: If an output file cannot be opened or a socket cannot
+                be bound.
         """
         self.logger.debug("UDP LISTENER: Starting UDP listeners...")
+        self._ensure_save_path()
 
-        # Read port configuration from the config file
+        # Port configuration from the config file
         ports = self.config["run"]["ports"].split()
-        tdcs = self.config["setup"]["tdc_ids"].split()
-
-        self.listeners = {}
-        for port, tdc in zip(ports, tdcs):
-            # Assign an automatic filename if none is provided
-            if outfile_suffix is None:
-                out_file = self.save_path / f"data_{tdc}.bin"
-            else:
-                out_file = self.save_path / f"data_{tdc}_{outfile_suffix}.bin"
+        tdcs = self._tdc_ids
 
-            # Start UDP listeners
-            listener = UDPListener(
+        # Assign automatic filenames if no suffix is provided
+        suffix = "" if outfile_suffix is None else f"_{outfile_suffix}"
+        self.listeners = {
+            port: UDPListener(
                 port=int(port),
-                out_file=out_file,
+                out_file=self._data_path_template.format(f"{tdc}{suffix}"),
                 logger=self.logger,
                 process_name="UDP LISTENER",
             )
-            listener.start()
-            # Wait for the socket to be confirmed running
-            listener.ready_event.wait()
-            self.listeners[port] = listener
+            for port, tdc in zip(ports, tdcs)
+        }
+
+        # Start all the UDP listeners first, so that their sockets are set
+        # up concurrently, and only then wait for each of them to be ready.
+        try:
+            for listener in self.listeners.values():
+                listener.start()
+        except OSError:
+            self._abort_listeners()
+            raise
+        # A listener is ready as soon as its socket is bound (bind() is
+        # synchronous), or as soon as setting it up failed.
+        deadline = time.monotonic() + self.LISTENER_READY_TIMEOUT
+        for port, listener in self.listeners.items():
+            if not listener.ready_event.wait(
+                timeout=max(0.0, deadline - time.monotonic())
+            ):
+                self.logger.error(
+                    "UDP LISTENER: Listener on port %s not ready after %.1f s.",
+                    port,
+                    self.LISTENER_READY_TIMEOUT,
+                )
+                self._abort_listeners()
+                raise RuntimeError(
+                    f"UDP LISTENER: Listener on port {port} not ready."
+                )
+            if listener.error is not None:
+                self._abort_listeners()
+                raise listener.error
+
+        if post_bind_delay > 0:
+            time.sleep(post_bind_delay)
 
-            time.sleep(1)
+    def _abort_listeners(self) -> None:
+        """Stop all the listeners after a failed start."""
+        for listener in self.listeners.values():
+            listener.stop(wait=False)
+        for listener in self.listeners.values():
+            listener.join()
+        self.listeners = None
 
     def run_link_delay_measurement(
         self, outfile_suffix: str | None = None, verbose: bool = False
@@ -262,17 +472,9 @@ class BlackCat(BaseDevice):
                 "Starting measurement..."
             )
 
-        # Read the script name from the config file
-        script_name = self.config["run"]["script_start"]
+        script = self._script_path("run", "script_start")
 
-        # Construct the full path to the script using the dynamically located scripts_dir
-        script = self.scripts_dir / script_name
-
-        run_shell_script(
-            script.as_posix(),
-            logger=self.logger,
-            process_name="DELAY LINK MEASUREMENT",
-        )
+        self._run_script(script, process_name="DELAY LINK MEASUREMENT")
 
         self.logger.info("DELAY LINK MEASUREMENT: Running...")
 
@@ -281,21 +483,19 @@ class BlackCat(BaseDevice):
         self.logger.debug("STOP MEASUREMENT: Stopping all UDP listeners...")
 
         # Stop the BC system
-        # Read the script name from the config file
-        script_name = self.config["run"]["script_stop"]
+        script = self._script_path("run", "script_stop")
 
-        # Construct the full path to the script using the dynamically located scripts_dir
-        script = self.scripts_dir / script_name
-
-        run_shell_script(
-            script.as_posix(),
-            logger=self.logger,
-            process_name="STOP MEASUREMENT",
-        )
+        self._run_script(script, process_name="STOP MEASUREMENT")
 
+        # The listeners are only stopped once the script has returned, so
+        # that the last packets sent by the modules are still written. All
+        # of them are signalled first and then joined, so their threads
+        # wind down concurrently.
         if self.listeners:
             for listener in self.listeners.values():
-                listener.stop()
+                listener.stop(wait=False)
+            for listener in self.listeners.values():
+                listener.join()
         else:
             self.logger.debug("STOP MEASUREMENT: No UDP listeners to stop.")
 
@@ -309,47 +509,16 @@ class BlackCat(BaseDevice):
         self.logger.info("REBOOT: Broadcasting ping of death...")
 
         # Send ping of death... not super safe.
-        # Read the script name from the config file
-        script_name = self.config["run"]["script_reboot"]
-
-        # Construct the full path to the script using the dynamically located scripts_dir
-        script = self.scripts_dir / script_name
-
-        def ping_of_death():
-            run_shell_script(
-                script.as_posix(),
-                logger=self.logger,
-                process_name="REBOOT",
-            )
-            # Wait a bit for the system to recover
-            self.logger.debug(
-                "REBOOT: Waiting for the system to recover from the ping of death..."
-            )
-            time.sleep(5)
-
-            self.logger.info(
-                "REBOOT: System has been rebooted. Waiting for all modules to "
-                "come back online..."
-            )
-
-            count = 0
-            modules_online = self.status(expected_count=self.expected_count)
-            while not modules_online and count < 10:  # hard-coded... not nice.
-                count += 1
-                self.logger.debug(
-                    "REBOOT: Waiting for all modules to come back online..."
-                )
-                time.sleep(2)
-                modules_online = self.status(expected_count=self.expected_count)
-
-            return modules_online
+        script = self._script_path("run", "script_reboot")
 
         attempts = 0
         while attempts < max_retry:
             attempts += 1
-            self.logger.debug(f"REBOOT: Attempt {attempts} of {max_retry}...")
+            self.logger.debug(
+                "REBOOT: Attempt %d of %d...", attempts, max_retry
+            )
             # Broadcast the ping of death
-            success = ping_of_death()
+            success = self._ping_of_death(script)
 
             if success:
                 self.logger.info("REBOOT: All modules are back online.")
@@ -362,8 +531,9 @@ class BlackCat(BaseDevice):
                 )
         else:
             self.logger.error(
-                f"REBOOT: Not all modules are back online after {max_retry} "
-                "attempts. Please check the system."
+                "REBOOT: Not all modules are back online after %d "
+                "attempts. Please check the system.",
+                max_retry,
             )
             raise RuntimeError(
                 f"REBOOT: Not all modules are back online after {max_retry} "
@@ -373,6 +543,43 @@ class BlackCat(BaseDevice):
         # Re-run setup after reboot
         self.setup(verbose=verbose)
 
+    def _ping_of_death(self, script: str) -> bool:
+        """Broadcast the ping of death and wait for the modules to recover.
+
+        Args:
+            script (str): Path to the reboot script.
+
+        Returns
+        -------
+            bool: True if all expected modules are back online.
+        """
+        self._run_script(script, process_name="REBOOT")
+        self.logger.debug(
+            "REBOOT: Waiting for the system to recover from the ping of death..."
+        )
+        time.sleep(self.REBOOT_SETTLE_TIME)
+        self.logger.info(
+            "REBOOT: System has been rebooted. Waiting for all modules to "
+            "come back online..."
+        )
+
+        # Then poll with exponential backoff (0.1 s up to 2 s between
+        # checks) until all modules are online or the recovery time is over.
+        delay = 0.1
+        deadline = time.monotonic() + self.REBOOT_RECOVERY_TIMEOUT
+        while True:
+            # Every poll must run `dog discover`: drop the cached status
+            self._status_cache = None
+            if self.status(expected_count=self.expected_count):
+                return True
+            if time.monotonic() >= deadline:
+                return False
+            self.logger.debug(
+                "REBOOT: Waiting for all modules to come back online..."
+            )
+            time.sleep(min(delay, max(0.0, deadline - time.monotonic())))
+            delay = min(1.5 * delay, 2.0)
+
     def status(self, expected_count: int, verbose: bool = False) -> bool:
         """Check if all expected modules are back online after a reboot.
 
@@ -384,51 +591,76 @@ class BlackCat(BaseDevice):
         Raises
         ------
         - RuntimeError
-            If the `dog discover` command fails.
+            If the `dog discover` command fails or does not finish within
+            `DOG_DISCOVER_TIMEOUT` seconds.
+        """
+        with self._status_lock:
+            cached = self._status_cache
+            if (
+                cached is not None
+                and cached[1] == expected_count
+                and time.monotonic() - cached[0] < self.STATUS_CACHE_TTL
+            ):
+                return cached[2]
+            online = self._dog_discover(expected_count, verbose)
+            self._status_cache = (time.monotonic(), expected_count, online)
+            return online
+
+    def _dog_discover(self, expected_count: int, verbose: bool) -> bool:
+        """Run `dog discover` and compare the module count.
+
+        See `status()`.
         """
         self.logger.info("DOG DISCOVER: Checking if all modules are online...")
 
         try:
             # Run the `dog discover` command
+            # The output is kept as bytes: it is only decoded for logging.
             result = subprocess.run(
-                ["dog", "discover"],
+                self._dog_discover_cmd,
                 capture_output=True,
-                text=True,
                 check=True,
+                timeout=self.DOG_DISCOVER_TIMEOUT,
+                close_fds=False,
             )
             output = result.stdout
-            if verbose:
-                self.logger.debug(f"DOG DISCOVER: output:\n{output}")
+            # Only decode the output if it is actually going to be logged.
+            if verbose and self.logger.isEnabledFor(logging.DEBUG):
+                self.logger.debug(
+                    "DOG DISCOVER: output:\n%s", output.decode(errors="replace")
+                )
 
             # Parse the output to count the number of modules
-            lines = output.strip().split("\n")
-            module_lines = [
-                line
-                for line in lines
-                if line.strip()
-                and not line.startswith("---")
-                and not line.startswith("IP-ADDR")
-            ]
+            n_modules = _count_modules(output)
 
             # Check if the number of modules matches the expected count
-            if len(module_lines) == expected_count:
+            if n_modules == expected_count:
                 self.logger.info(
-                    f"DOG DISCOVER: All {expected_count} modules online."
+                    "DOG DISCOVER: All %d modules online.", expected_count
                 )
                 return True
             else:
                 self.logger.warning(
-                    f"DOG DISCOVER: Expected {expected_count} modules, "
-                    f"but found {len(module_lines)}."
+                    "DOG DISCOVER: Expected %d modules, but found %d.",
+                    expected_count,
+                    n_modules,
                 )
                 return False
 
         except subprocess.CalledProcessError as e:
+            stderr = e.stderr.decode(errors="replace")
+            self.logger.error(
+                "DOG DISCOVER: Failed to run 'dog discover': %s. Command: %s",
+                stderr,
+                e.cmd,
+            )
+            raise RuntimeError(f"DOG DISCOVER: command failed: {stderr}")
+        except subprocess.TimeoutExpired as e:
             self.logger.error(
-                f"DOG DISCOVER: Failed to run 'dog discover': {e.stderr}. "
-                f"Command: {e.cmd}"
+                "DOG DISCOVER: 'dog discover' timed out after %.1f s.",
+                e.timeout,
             )
-            raise RuntimeError(f"DOG DISCOVER: command failed: {e.stderr}")
+            raise RuntimeError(f"DOG DISCOVER: command timed out: {e.cmd}")
 
 
 class USBDevice(BaseDevice):
@@ -450,7 +682,9 @@ class USBDevice(BaseDevice):
 
         self.device: str = Path(device).as_posix()
         self._name: str = Path(device).name
-        self.logger.info(f"{self.device}: Initialized.")
+        self.usb_reader: USBReader | None = None
+        self._setup_args: tuple[str, ...] = ("--ext_device", self.device)
+        self.logger.info("%s: Initialized.", self.device)
 
     @property
     def name(self) -> str:
@@ -462,7 +696,7 @@ class USBDevice(BaseDevice):
         """Setter for the `name` attribute."""
         if not new_name:
             raise ValueError("The name cannot be empty.")
-        self.logger.info(f"Updating name from {self._name} to {new_name}.")
+        self.logger.info("Updating name from %s to %s.", self._name, new_name)
         self._name = new_name
 
     def setup(self, verbose: bool = False) -> None:
@@ -470,29 +704,19 @@ class USBDevice(BaseDevice):
 
         Raises
         ------
-            KeyError: If the "setup" section or "script" key is missing in
-                the config file.
+            KeyError: If the "external_TDCs" section or "script_setup" key
+                is missing in the config file.
         """
-        self.logger.info(f"{self.name} SETUP: Starting the setup process...")
-
-        # Read the script name from the config file
-        script_name = self.config["external_TDCs"]["script_setup"]
+        self.logger.info("%s SETUP: Starting the setup process...", self.name)
 
-        # Construct the full path to the script using the dynamically
-        # located scripts_dir
-        script = self.scripts_dir / script_name
+        script = self._script_path("external_TDCs", "script_setup")
 
-        arguments = ["--ext_device", self.device]
+        arguments = self._setup_args
         if verbose:
-            arguments.append("--verbose")
+            arguments += ("--verbose",)
 
-        run_shell_script(
-            script.as_posix(),
-            arguments=arguments,
-            logger=self.logger,
-            process_name=f"{self.name} SETUP",
-        )
-        self.logger.info(f"{self.name} SETUP: DONE.")
+        self._run_script(script, arguments, process_name=f"{self.name} SETUP")
+        self.logger.info("%s SETUP: DONE.", self.name)
 
     def start_usb_reading(self, outfile_suffix: str | None = None) -> None:
         """Start reading data from the USB device in the background.
@@ -500,17 +724,20 @@ class USBDevice(BaseDevice):
         Args:
             outfile_suffix (str): Suffix for the output file where data will be saved.
         """
+        self._ensure_save_path()
         if outfile_suffix is None:
-            out_file = self.save_path / f"data_{self.name}.bin"
+            out_file = self._data_path_template.format(self.name)
         else:
-            out_file = self.save_path / f"data_{self.name}_{outfile_suffix}.bin"
+            out_file = self._data_path_template.format(
+                f"{self.name}_{outfile_suffix}"
+            )
 
         self.logger.info(
-            f"{self.name} USB_READER: Starting USB reading to {out_file}..."
+            "%s USB_READER: Starting USB reading to %s...", self.name, out_file
         )
         self.usb_reader = USBReader(
             device=self.device,
-            out_file=str(out_file),
+            out_file=out_file,
             logger=self.logger,
             process_name=f"{self.name} USB_READER",
         )
@@ -519,10 +746,12 @@ class USBDevice(BaseDevice):
     def stop_usb_reading(self) -> None:
         """Stop the USB reading process."""
         if self.usb_reader:
-            self.logger.info(f"{self.name} USB_READER: Stopping USB reading...")
+            self.logger.info(
+                "%s USB_READER: Stopping USB reading...", self.name
+            )
             self.usb_reader.stop()
             self.usb_reader = None
         else:
             self.logger.warning(
-                f"{self.device} USB_READER: No USB reading process to stop."
+                "%s USB_READER: No USB reading process to stop.", self.device
             )
@@ -9,12 +9,22 @@ Feel free to write your own version of these functions.
 (C-code originally by Michael Boehmer for the BlackCat project).
 """
 
+import os
+import struct
 import sys
 from collections.abc import Generator
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from functools import lru_cache
+from itertools import repeat
 from typing import BinaryIO
 
 import numpy as np
-import pandas as pd
+
+try:
+    from numba import njit
+except ModuleNotFoundError:
+    njit = None
 
 # For BlackCat TDCs
 TDC_FREQ = 340.0
@@ -36,12 +46,86 @@ I2C_LM75B_DIVISOR = 32
 I2C_MAX31726_SCALE = 0.00390625
 MESSAGE_OK = 0x4F4B0D0A
 
+# Channel pairs of the time differences in the USB TDC output, and the
+# format of an output line
+_USB_TDC_PAIRS = tuple(
+    (i - 1, j) for i in range(MAX_TDC_CHANNEL, 0, -1) for j in range(i - 1)
+)
+_USB_TDC_LINE = " ".join(f"{i}.{j} %11.5f" for i, j in _USB_TDC_PAIRS) + " %d"
+_USB_TDC_NO_DIFFS = (0.0,) * len(_USB_TDC_PAIRS)
+_USB_TDC_PAIRS_I, _USB_TDC_PAIRS_J = np.array(_USB_TDC_PAIRS).T
+
+# Block of big-endian longwords read at a time by read_longwords (64 KiB)
+_LONGWORDS_BLOCK = struct.Struct(">16384I")
+
+# Coarse time of every coarse counter value of the DLM hits, in ns. Keep
+# the operation order of `ct * 1000.0 / TDC_FREQ`: a precomputed
+# 1000.0 / TDC_FREQ factor would change the last bits of the result.
+_COARSE_NS = np.arange(1 << 12) * 1000.0 / TDC_FREQ
+
+# Number of DLM records decoded at a time
+_DLM_CHUNK = 1 << 17
+
+# Number of USB TDC data words decoded at a time
+_USB_CHUNK = 1 << 16
+
+# Kinds of items returned by _scan_usb_tdc_words
+_USB_BLOCK = 0
+_USB_PLACEHOLDER = 1
+_USB_TEMPERATURE = 2
+_USB_INFO = 3
+_USB_INCOMPLETE = 4
+_USB_BAD_FINE = 5
+_USB_BAD_CHANNEL = 6
+
+# Info messages of the USB TDC decoding
+_USB_INFO_SPURIOUS = 0
+_USB_INFO_SKIPPED = 1
+_USB_INFO_MULTIPLE = 2
+_USB_INFO_MESSAGES = (
+    "# INFO: Spurious hit between blocks",
+    "# INFO: Skipped block",
+    "# INFO: Multiple hits detected",
+)
+
+# How the DLM data ended, as returned by _scan_dlm_records
+_DLM_END = 0
+_DLM_EOF = 1
+_DLM_EPOC = 2
+
+# Columns of the calibration files written by process_raw_cal
+_CAL_DTYPE = np.dtype(
+    [
+        ("BIN", np.int64),
+        ("ENTRIES", np.int64),
+        ("BIN_WIDTH", np.float64),
+        ("BIN_CENTER", np.float64),
+        ("BIN_SUM", np.float64),
+    ]
+)
+
+# Version of the output format of process_raw_cal. Bump it whenever the
+# output changes, so that cached calibration files are regenerated.
+CAL_FORMAT_VERSION = 1
+
+
+def _jit(func):
+    """Compile `func` with Numba if it is installed (the `fast` extra)."""
+    if njit is None:
+        return func
+    return njit(cache=True, nogil=True)(func)
+
 
 def process_raw_cal(infile: str, outfile: str, verbose: bool = False) -> None:
     """Process a raw calibration file.
 
     Generates a human-readable calibration data file.
 
+    Every line of the raw file holds the number of entries of one bin of
+    the fine time histogram. The entries are a snapshot of the bin, not an
+    increment: if a bin appears more than once, the last line for it
+    replaces the earlier ones, as in the original C implementation.
+
     Args:
         infile (str): Path to the input raw calibration file.
         outfile (str): Path to the output calibration data file.
@@ -55,39 +139,47 @@ def process_raw_cal(infile: str, outfile: str, verbose: bool = False) -> None:
         entries = np.zeros(BLOCK_RAM_SIZE, dtype=int)
 
         # First pass: Read input file and calculate sum and raw_bin
+        # int() ignores the surrounding whitespace (and newline) itself
         with open(infile) as fin:
-            for line in fin:
-                value = int(line.strip(), 0)
-                # Extract bits 20-28 from value and shift them to the
-                # least significant bit (lsb) position.
-                bin_num = (value & 0x1FF00000) >> 20
-                # Extract bits 0-17 from value and store them as the entry.
-                entry = value & 0x0003FFFF
-                entries[bin_num] = entry
+            values = np.fromiter(map(int, fin, repeat(0)), dtype=np.int64)
+        # Extract bits 20-28 from each value and shift them to the
+        # least significant bit (lsb) position.
+        bin_nums = (values & 0x1FF00000) >> 20
+        # If a bin appears more than once, the last occurrence wins. The
+        # first occurrence in the reversed array is the last one; assigning
+        # with repeated indices would leave the choice to NumPy.
+        bins, from_end = np.unique(bin_nums[::-1], return_index=True)
+        last = len(bin_nums) - 1 - from_end
+        # Extract bits 0-17 from each value and store them as the entry.
+        entries[bins] = values[last] & 0x0003FFFF
 
         # Calculate bin_lsb
-        sum_entries = sum(entries)
+        sum_entries = int(entries.sum(dtype=np.int64))
         bin_lsb = FT_UNIT / sum_entries if sum_entries != 0 else 0.0
 
-        # Second pass: Write output
-        summed = 0.0
+        # Second pass: cumulative bin widths (np.cumsum adds sequentially,
+        # so the sums match a running Python total exactly)
+        bin_width = entries * bin_lsb
+        summed = np.cumsum(bin_width)
+        bin_center = summed - 0.5 * bin_width
+
         with open(outfile, "w") as fout:
-            # Write the # SUM line
+            # The # SUM line and the header line
             fout.write(
                 f"# SUM {sum_entries:10d} {FT_UNIT:10.5f} {bin_lsb:10.5e}\n\n"
+                "BIN   ENTRIES   BIN_WIDTH   BIN_CENTER   BIN_SUM\n"
+            )
+            # One line per bin, formatted and written in one go
+            rows = zip(
+                range(len(entries)),
+                entries.tolist(),
+                bin_width.tolist(),
+                bin_center.tolist(),
+                summed.tolist(),
+            )
+            fout.write(
+                "".join(map("%4d %8d %10.5f %10.5f %10.5f\n".__mod__, rows))
             )
-
-            # Write the header line
-            fout.write("BIN   ENTRIES   BIN_WIDTH   BIN_CENTER   BIN_SUM\n")
-
-            # Process bins and write results
-            for i in range(len(entries)):
-                bin_width = entries[i] * bin_lsb
-                summed += bin_width
-                bin_center = summed - 0.5 * bin_width
-                fout.write(
-                    f"{i:4d} {entries[i]:8d} {bin_width:10.5f} {bin_center:10.5f} {summed:10.5f}\n"
-                )
 
         if verbose:
             print("Processing completed successfully.\n")
@@ -97,37 +189,42 @@ def process_raw_cal(infile: str, outfile: str, verbose: bool = False) -> None:
         raise
 
 
-def load_calibration_file(cal_file: str) -> pd.DataFrame:
-    """Load the calibration file into a pandas DataFrame.
+def load_calibration_file(cal_file: str) -> np.ndarray:
+    """Load the calibration file into a structured array.
 
     Args:
         cal_file (str): Path to the calibration file.
 
     Returns
     -------
-        pd.DataFrame: DataFrame containing the calibration data.
+        np.ndarray: The calibration data, with one field per column (see
+            `_CAL_DTYPE`).
 
     Raises
     ------
-        ValueError: If the number of bins is incorrect.
+        ValueError: If the columns or the number of bins are incorrect.
         FileNotFoundError: If the file is invalid.
     """
     try:
-        # Use pandas to read the calibration file, skipping the first two lines
-        df = pd.read_csv(
-            cal_file,
-            sep=r"\s+",
-            skiprows=2,
-            header=0,
-        )
+        with open(cal_file) as f:
+            # Skip the # SUM line and the empty line, then check the header
+            for _ in range(2):
+                f.readline()
+            columns = tuple(f.readline().split())
+            if columns != _CAL_DTYPE.names:
+                raise ValueError(
+                    f"Expected columns {' '.join(_CAL_DTYPE.names)}, "
+                    f"got {' '.join(columns)}"
+                )
+            data = np.loadtxt(f, dtype=_CAL_DTYPE, ndmin=1)
 
         # Ensure the number of bins matches BLOCK_RAM_SIZE
-        if len(df) != BLOCK_RAM_SIZE:
+        if len(data) != BLOCK_RAM_SIZE:
             raise ValueError(
                 f"Calibration file must contain exactly {BLOCK_RAM_SIZE} bins."
             )
 
-        return df
+        return data
 
     except FileNotFoundError:
         raise FileNotFoundError(f"Calibration file '{cal_file}' not found.")
@@ -135,6 +232,50 @@ def load_calibration_file(cal_file: str) -> pd.DataFrame:
         raise ValueError(f"Error parsing calibration file: {e}.")
 
 
+def _fine_time_lut(cal_file: str) -> np.ndarray:
+    """Return the fine time correction of every bin of a calibration file.
+
+    Args:
+        cal_file (str): Path to the calibration file.
+
+    Returns
+    -------
+        np.ndarray: The read-only fine time correction of every bin in ns.
+
+    Raises
+    ------
+        ValueError: If the number of bins is incorrect.
+        FileNotFoundError: If the file is invalid.
+    """
+    try:
+        mtime_ns = os.stat(cal_file).st_mtime_ns
+    except FileNotFoundError:
+        raise FileNotFoundError(f"Calibration file '{cal_file}' not found.")
+    return _load_fine_time_lut(os.fspath(cal_file), mtime_ns)
+
+
+@lru_cache(maxsize=16)
+def _load_fine_time_lut(cal_file: str, mtime_ns: int) -> np.ndarray:
+    """Load the fine time LUT of a calibration file, caching the result.
+
+    The modification time is part of the cache key, so a recalibrated
+    file is read again. Use `_load_fine_time_lut.cache_clear()` to drop
+    the cache.
+
+    Args:
+        cal_file (str): Path to the calibration file.
+        mtime_ns (int): Modification time of the file in nanoseconds.
+
+    Returns
+    -------
+        np.ndarray: The read-only fine time correction of every bin in ns.
+    """
+    lut_ft_ns = load_calibration_file(cal_file)["BIN_CENTER"] / 1000.0
+    # The same array is shared by all the callers
+    lut_ft_ns.flags.writeable = False
+    return lut_ft_ns
+
+
 def read_longwords(file: BinaryIO) -> Generator[int, None, None]:
     """Read 4-byte longwords from the file and yield them as integers.
 
@@ -149,11 +290,70 @@ def read_longwords(file: BinaryIO) -> Generator[int, None, None]:
     ------
         EOFError: If fewer than 4 bytes are read.
     """
-    while True:
-        data_bytes = file.read(4)
-        if len(data_bytes) != 4:
-            break
-        yield int.from_bytes(data_bytes, byteorder="big")
+    # Read blocks of longwords, carrying over any incomplete longword at
+    # the end of a block to the next one
+    rest = b""
+    while data := file.read(_LONGWORDS_BLOCK.size):
+        if rest:
+            data = rest + data
+        n_words = len(data) // 4
+        if n_words * 4 == _LONGWORDS_BLOCK.size:
+            yield from _LONGWORDS_BLOCK.unpack(data)
+        else:
+            yield from struct.unpack_from(f">{n_words}I", data)
+        rest = data[n_words * 4 :]
+
+
+def read_longwords_bulk(file: BinaryIO) -> np.ndarray:
+    """Read all the remaining 4-byte longwords from the file at once.
+
+    Args:
+        file (BinaryIO): The binary file to read from.
+
+    Returns
+    -------
+        np.ndarray: The big-endian longwords, as unsigned 32-bit integers.
+            Trailing bytes that do not make a full longword are ignored,
+            as in `read_longwords`.
+    """
+    # The data is read rather than memory-mapped: a mapped file that is
+    # truncated meanwhile (e.g. by a new run writing to it) kills the
+    # process with SIGBUS.
+    data = file.read()
+    return np.frombuffer(data, dtype=">u4", count=len(data) // 4)
+
+
+def read_40bit_words_bulk(file: BinaryIO) -> np.ndarray:
+    """Read all the remaining 5-byte (40 bit) words from the file at once.
+
+    Args:
+        file (BinaryIO): The binary file to read from.
+
+    Returns
+    -------
+        np.ndarray: The big-endian words, as unsigned 64-bit integers.
+            Trailing bytes that do not make a full word are ignored.
+    """
+    return _unpack_40bit_words(file.read())
+
+
+def _unpack_40bit_words(data: bytes | memoryview) -> np.ndarray:
+    """Unpack big-endian 5-byte (40 bit) words.
+
+    Args:
+        data (bytes | memoryview): The raw data.
+
+    Returns
+    -------
+        np.ndarray: The words, as unsigned 64-bit integers. Trailing bytes
+            that do not make a full word are ignored.
+    """
+    raw = np.frombuffer(data, dtype=np.uint8, count=len(data) // 5 * 5)
+    # Pad every word with three zero bytes in front, so that the rows can
+    # be read as big-endian 64-bit integers without any shifting.
+    padded = np.zeros((len(raw) // 5, 8), dtype=np.uint8)
+    padded[:, 3:] = raw.reshape(-1, 5)
+    return padded.view(">u8").ravel().astype(np.uint64)
 
 
 def unpack_dlm_data(
@@ -183,243 +383,99 @@ def unpack_dlm_data(
             print("Output will be printed to stdout.")
         print(f"Expected DLM period: {period} ns")
 
-    # Load the calibration file
-    calibration_data = load_calibration_file(cal_file)
-    lut_ft = calibration_data["BIN_CENTER"].values
+    # Fine time correction of every bin, in ns
+    lut_ft_ns = _fine_time_lut(cal_file)
 
     if verbose:
         print(
             "\nCalibration data loaded successfully. Number of bins: "
-            f"{len(lut_ft)}"
+            f"{len(lut_ft_ns)}"
         )
 
     dlm_period = float(period)
-    epoc_raw = 0
-    first_hit = True
-    # state = {"epoc_raw": 0, "first_hit": True}
-
-    def process_epoch(dataword: int, epoc_raw: int, first_hit: bool):
-        """Process an epoch word and calculate the epoch difference.
-
-        Returns
-        -------
-            Tuple[int, float, bool]: Updated epoc_raw_old, epoch difference in
-                ns, and first_hit flag.
-        """
-        epoc = dataword & 0x0FFFFFFF
-
-        if first_hit:
-            return epoc, 0.0, False
-
-        epoc_diff_int = epoc - epoc_raw
-        if epoc_diff_int < 0:
-            epoc_diff_int += 1 << 28
-        epoc_diff = epoc_diff_int * EPOC_UNIT
-
-        return epoc, epoc_diff, first_hit
-
-    def process_hit(dataword: int):
-        """Process a hit word and calculates the corrected time.
-
-        Returns
-        -------
-            Tuple[int, float]: The channel number and corrected time.
-        """
-        ch = (dataword & 0x1FC00000) >> 22
-        ct = (dataword & 0x000007FF) << 1
-        if dataword & 0x00200000:
-            ct += 1
-        ft = (dataword & 0x001FF000) >> 12
-
-        fine = lut_ft[ft] / 1000.0
-        coarse = ct * 1000.0 / TDC_FREQ
-        corrected_time = coarse - fine
-
-        return ch, corrected_time
-
-    # def process_dataword(
-    #     dataword,
-    #     longwords,
-    #     fout,
-    #     verbose,
-    #     dlm_period,
-    #     lut_ft,
-    #     state,
-    # ):
-    #     """Process a single dataword and handle output.
-
-    #     Helper function.
-    #     """
-    #     # The first longword should be an epoch (no msb)
-    #     if dataword & 0x80000000:
-    #         if verbose:
-    #             print("# WARNING: WRONG STRUCTURE (0) - HIT FOUND")
-    #         return
-
-    #     # Process epoch
-    #     epoc_raw, epoc_diff, first_hit = process_epoch(
-    #         dataword, state["epoc_raw"], state["first_hit"]
-    #     )
-    #     # Update state
-    #     state["epoc_raw"] = epoc_raw
-    #     state["first_hit"] = first_hit
-
-    #     if first_hit:
-    #         return
-
-    #     if dlm_period * 0.95 < epoc_diff <= dlm_period * 1.05:
-    #         mode = 0
-    #     elif 2 * dlm_period * 0.95 < epoc_diff <= 2 * dlm_period * 1.05:
-    #         mode = 1
-    #     else:
-    #         mode = -1
-
-    #     # Fetch first hit
-    #     dataword = next(longwords)
-    #     if not (dataword & 0x80000000):
-    #         raise ValueError("Wrong structure: EPOC found")
-
-    #     ch_a, hit_a = process_hit(dataword)
-
-    #     # Maybe fetch new epoc before second hit
-    #     dataword = next(longwords)
-    #     if not (dataword & 0x80000000):
-    #         epoc_raw, epoc_diff, first_hit = process_epoch(
-    #             dataword, state["epoc_raw"], state["first_hit"]
-    #         )
-    #         state["epoc_raw"] = epoc_raw
-    #         state["first_hit"] = first_hit
-    #         dataword = next(longwords)
-
-    #     ch_b, hit_b = process_hit(dataword)
-
-    #     if ch_a == ch_b:
-    #         delta_t = hit_b - hit_a
-    #         if delta_t < 0:
-    #             delta_t += EPOC_UNIT
-    #         output_line = f"{ch_a:2} {delta_t:11.5f} {mode}"
-    #         if fout:
-    #             fout.write(output_line + "\n")
-    #         else:
-    #             print(output_line)
-
-    #     else:
-    #         raise ValueError("Channel mixup detected")
-
-    # try:
-    #     with open(infile, "rb") as fin:
-    #         longwords = read_longwords(fin)
-    #         try:
-    #             if outfile:
-    #                 with open(outfile, "w") as fout:
-    #                     for dataword in longwords:
-    #                         process_dataword(
-    #                             dataword,
-    #                             longwords,
-    #                             fout,
-    #                             verbose,
-    #                             dlm_period,
-    #                             lut_ft,
-    #                             state,
-    #                         )
-    #             else:
-    #                 # Print directly to stdout
-    #                 for dataword in longwords:
-    #                     process_dataword(
-    #                         dataword,
-    #                         longwords,
-    #                         None,
-    #                         verbose,
-    #                         dlm_period,
-    #                         lut_ft,
-    #                         state,
-    #                     )
-
-    #         except StopIteration:
-    #             if verbose:
-    #                 print("# End of file reached")
-
-    #     if verbose:
-    #         print("\nUnpacking completed successfully.")
-
-    # except FileNotFoundError as e:
-    #     print(f"Error: {e}")
-    #     raise
-    # except ValueError as e:
-    #     print(f"Error: {e}")
-    #     raise
 
     try:
-        with (
-            open(infile, "rb") as fin,
-            open(outfile, "w") if outfile else None as fout,
-        ):
-            longwords = read_longwords(fin)
-
-            try:
-                for dataword in longwords:
-                    # The first longword should be an epoch (no msb)
-                    if dataword & 0x80000000:
-                        if verbose:
-                            print("# WARNING: WRONG STRUCTURE (0) - HIT FOUND")
-                        continue
-
-                    # Process epoch
-                    epoc_raw, epoc_diff, first_hit = process_epoch(
-                        dataword, epoc_raw, first_hit
-                    )
-
-                    if first_hit:
-                        continue
-
-                    if dlm_period * 0.95 < epoc_diff <= dlm_period * 1.05:
-                        mode = 0
-                    elif (
-                        2 * dlm_period * 0.95
-                        < epoc_diff
-                        <= 2 * dlm_period * 1.05
-                    ):
-                        mode = 1
-                    else:
-                        mode = -1
-
-                    # Read and process the first hit
-                    dataword = next(longwords)
-                    if not (dataword & 0x80000000):
-                        raise ValueError("Wrong structure: EPOC found")
-
-                    ch_a, hit_a = process_hit(dataword)
-
-                    # Read and process the second hit
-                    dataword = next(longwords)
-
-                    if not (dataword & 0x80000000):
-                        epoc_raw, epoc_diff, first_hit = process_epoch(
-                            dataword, epoc_raw, first_hit
-                        )
-                        dataword = next(longwords)
-
-                    ch_b, hit_b = process_hit(dataword)
-
-                    if ch_a == ch_b:
-                        delta_t = hit_b - hit_a
-                        if delta_t < 0:
-                            delta_t += EPOC_UNIT
-                        output_line = f"{ch_a:2} {delta_t:11.5f} {mode}"
-                        if fout:
-                            fout.write(output_line + "\n")
-                        else:
-                            print(output_line)
-                    else:
-                        raise ValueError("Channel mixup detected")
+        with open(infile, "rb") as fin:
+            words = read_longwords_bulk(fin)
+        is_hit = (words & 0x80000000) != 0
 
-            except StopIteration:
-                if verbose:
-                    print("# End of file reached")
+        # Walk the data structure once to find the records
+        starts, second_hits, mid_epochs, skipped, end = _parse_dlm_records(
+            is_hit
+        )
+
+        # Decode the epochs of the records. The previous epoch of a record
+        # is the last epoch word read before it: the start of the previous
+        # record, or the epoch between its two hits.
+        epoc = (words[starts] & 0x0FFFFFFF).astype(np.int64)
+        last_epoch = np.where(mid_epochs, starts + 2, starts)
+        prev_epoc = (words[last_epoch[:-1]] & 0x0FFFFFFF).astype(np.int64)
+        epoc_diff = np.empty(len(starts), dtype=np.float64)
+        epoc_diff[:1] = 0.0  # No previous epoch for the first record
+        epoc_diff[1:] = ((epoc[1:] - prev_epoc) & 0x0FFFFFFF) * EPOC_UNIT
+
+        mode = np.full(len(starts), -1, dtype=np.int64)
+        mode[
+            (2 * dlm_period * 0.95 < epoc_diff)
+            & (epoc_diff <= 2 * dlm_period * 1.05)
+        ] = 1
+        mode[
+            (dlm_period * 0.95 < epoc_diff) & (epoc_diff <= dlm_period * 1.05)
+        ] = 0
+
+        # Decode the two hits of every record
+        ch_a, ch_b, delta_t = _decode_dlm_records(
+            words, starts, second_hits, lut_ft_ns
+        )
+
+        # The data is only valid up to the first channel mixup
+        mixups = np.flatnonzero(ch_a != ch_b)
+        n_valid = mixups[0] if len(mixups) else len(starts)
+        if n_valid < len(starts):
+            end = ("mixup", starts[n_valid])
+
+        # Format all the output lines in one go
+        lines = list(
+            map(
+                "%2d %11.5f %d\n".__mod__,
+                zip(
+                    ch_a[:n_valid].tolist(),
+                    delta_t[:n_valid].tolist(),
+                    mode[:n_valid].tolist(),
+                ),
+            )
+        )
+
+        # Warnings for the hits skipped before the data ended
+        n_warnings = 0
+        if verbose:
+            stop = end[1] if end[0] in ("epoc", "mixup") else len(words)
+            n_warnings = int(np.searchsorted(skipped, stop))
+        warning = "# WARNING: WRONG STRUCTURE (0) - HIT FOUND\n"
+
+        if outfile:
+            with open(outfile, "w") as fout:
+                sys.stdout.write(warning * n_warnings)
+                fout.write("".join(lines))
+        else:
+            # Put each warning before the first record after the skipped hit
+            pos = np.searchsorted(starts[:n_valid], skipped[:n_warnings])
+            chunks = []
+            prev = 0
+            for k in pos.tolist():
+                chunks.extend(lines[prev:k])
+                chunks.append(warning)
+                prev = k
+            chunks.extend(lines[prev:])
+            sys.stdout.write("".join(chunks))
+
+        if end[0] == "mixup":
+            raise ValueError("Channel mixup detected")
+        if end[0] == "epoc":
+            raise ValueError("Wrong structure: EPOC found")
+        if end[0] == "eof" and verbose:
+            print("# End of file reached")
 
-            finally:
-                if fout:
-                    fout.close()
         if verbose:
             print("\nUnpacking completed successfully.")
 
@@ -431,6 +487,252 @@ def unpack_dlm_data(
         raise
 
 
+def unpack_dlm_files(
+    cal_file: str,
+    infiles: list[str],
+    outfiles: list[str],
+    period: int = 10000000,
+    verbose: bool = False,
+    max_workers: int | None = None,
+) -> None:
+    """Unpack several DLM data files using the same calibration file.
+
+    The kernel is asked to start reading all the input files right away,
+    so that the later files are already in the page cache when their
+    turn comes. The files are unpacked in parallel threads: most of the
+    work is done by NumPy (and Numba, if installed) without holding the
+    GIL.
+
+    Args:
+        cal_file (str): Path to the calibration file.
+        infiles (list[str]): Paths to the binary input files.
+        outfiles (list[str]): Path to the output file of each input file.
+        period (int): Period between DLMs in [ns]. Defaults to 10ms.
+        verbose (bool): If True, prints additional information during
+            processing. The messages of different files may be interleaved
+            unless max_workers is 1.
+        max_workers (int | None): Number of files unpacked at the same
+            time. Defaults to the number of CPUs.
+
+    Raises
+    ------
+        ValueError: If the numbers of input and output files differ.
+    """
+    if len(infiles) != len(outfiles):
+        raise ValueError(
+            f"Got {len(infiles)} input files but {len(outfiles)} output files."
+        )
+
+    for infile in infiles:
+        _prefetch(infile)
+
+    max_workers = min(len(infiles), max_workers or os.cpu_count() or 1)
+    if max_workers <= 1:
+        for infile, outfile in zip(infiles, outfiles, strict=True):
+            unpack_dlm_data(
+                cal_file,
+                infile,
+                period=period,
+                outfile=outfile,
+                verbose=verbose,
+            )
+        return
+
+    # Every file has its own output file, so they can be unpacked in
+    # parallel.
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        # Consume the results to re-raise any error from the workers.
+        list(
+            executor.map(
+                unpack_dlm_data,
+                repeat(cal_file),
+                infiles,
+                repeat(period),
+                outfiles,
+                repeat(verbose),
+            )
+        )
+
+
+def _prefetch(path: str) -> None:
+    """Ask the kernel to read a file into the page cache in the background.
+
+    Does nothing where `os.posix_fadvise` is not available, or if the file
+    cannot be opened (the error is raised when it is actually read).
+
+    Args:
+        path (str): Path to the file.
+    """
+    if not hasattr(os, "posix_fadvise"):
+        return
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+    finally:
+        os.close(fd)
+
+
+def _parse_dlm_records(
+    is_hit: np.ndarray,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, tuple]:
+    """Find the records in a stream of DLM data words.
+
+    A record is an epoch word followed by two hits, with an optional
+    epoch word between the hits. Hits found where an epoch is expected
+    are skipped.
+
+    Args:
+        is_hit (np.ndarray): For every data word, whether it is a hit.
+
+    Returns
+    -------
+        Tuple: The index of the first word of each record, the index of
+            its second hit, whether it has an epoch between the hits, the
+            indices of the skipped hits, and how the data ended:
+            ("end", None) after a complete record, ("eof", None) in the
+            middle of a record, or ("epoc", i) if the record starting at
+            i is not followed by a hit.
+    """
+    n = len(is_hit)
+    if njit is None:
+        # Plain Python is much faster on lists than on arrays
+        is_hit = is_hit.tolist()
+        starts = [0] * (n // 3)
+        second_hits = [0] * (n // 3)
+        skipped = [0] * n
+    else:
+        starts = np.empty(n // 3, dtype=np.intp)
+        second_hits = np.empty(n // 3, dtype=np.intp)
+        skipped = np.empty(n, dtype=np.intp)
+
+    n_records, n_skipped, end_code, end_index = _scan_dlm_records(
+        is_hit, starts, second_hits, skipped
+    )
+
+    starts = np.array(starts[:n_records], dtype=np.intp)
+    second_hits = np.array(second_hits[:n_records], dtype=np.intp)
+    mid_epochs = second_hits - starts == 3
+    skipped = np.array(skipped[:n_skipped], dtype=np.intp)
+    if end_code == _DLM_EPOC:
+        end = ("epoc", end_index)
+    elif end_code == _DLM_EOF:
+        end = ("eof", None)
+    else:
+        end = ("end", None)
+    return starts, second_hits, mid_epochs, skipped, end
+
+
+@_jit
+def _scan_dlm_records(is_hit, starts, second_hits, skipped):
+    """Walk the DLM data words, filling in the records found.
+
+    Compiled with Numba when it is installed. Without it, this runs as
+    plain Python on lists.
+
+    Args:
+        is_hit: For every data word, whether it is a hit.
+        starts: Filled with the index of the first word of each record.
+        second_hits: Filled with the index of the second hit of each
+            record.
+        skipped: Filled with the indices of the skipped hits.
+
+    Returns
+    -------
+        Tuple: The number of records, the number of skipped hits, how the
+            data ended (_DLM_END, _DLM_EOF or _DLM_EPOC) and the start of
+            the record not followed by a hit (-1 unless _DLM_EPOC).
+    """
+    n = len(is_hit)
+    n_records = 0
+    n_skipped = 0
+    i = 0
+    while i < n:
+        if is_hit[i]:
+            skipped[n_skipped] = i
+            n_skipped += 1
+            i += 1
+            continue
+        if i + 1 >= n:
+            return n_records, n_skipped, _DLM_EOF, -1
+        if not is_hit[i + 1]:
+            return n_records, n_skipped, _DLM_EPOC, i
+        if i + 2 >= n:
+            return n_records, n_skipped, _DLM_EOF, -1
+        # The second hit may follow a new epoch word
+        second = i + 2 if is_hit[i + 2] else i + 3
+        if second >= n:
+            return n_records, n_skipped, _DLM_EOF, -1
+        starts[n_records] = i
+        second_hits[n_records] = second
+        n_records += 1
+        i = second + 1
+    return n_records, n_skipped, _DLM_END, -1
+
+
+def _decode_dlm_records(
+    words: np.ndarray,
+    starts: np.ndarray,
+    second_hits: np.ndarray,
+    lut_ft_ns: np.ndarray,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Decode the two hits of every DLM record.
+
+    The records are decoded in chunks of `_DLM_CHUNK`, so that the
+    temporary arrays stay small (and in cache) for large files.
+
+    Args:
+        words (np.ndarray): The data words.
+        starts (np.ndarray): Index of the first word of each record.
+        second_hits (np.ndarray): Index of the second hit of each record.
+        lut_ft_ns (np.ndarray): Fine time correction of every bin in ns.
+
+    Returns
+    -------
+        Tuple[np.ndarray, np.ndarray, np.ndarray]: The channel numbers of
+            the two hits and the time between them.
+    """
+    n = len(starts)
+    ch_a = np.empty(n, dtype=np.int64)
+    ch_b = np.empty(n, dtype=np.int64)
+    delta_t = np.empty(n, dtype=np.float64)
+    for lo in range(0, n, _DLM_CHUNK):
+        hi = min(lo + _DLM_CHUNK, n)
+        ch_a[lo:hi], hit_a = _decode_dlm_hits(
+            words[starts[lo:hi] + 1], lut_ft_ns
+        )
+        ch_b[lo:hi], hit_b = _decode_dlm_hits(
+            words[second_hits[lo:hi]], lut_ft_ns
+        )
+        np.subtract(hit_b, hit_a, out=delta_t[lo:hi])
+    np.add(delta_t, EPOC_UNIT, out=delta_t, where=delta_t < 0)
+    return ch_a, ch_b, delta_t
+
+
+def _decode_dlm_hits(
+    words: np.ndarray, lut_ft_ns: np.ndarray
+) -> tuple[np.ndarray, np.ndarray]:
+    """Decode hit words into channel numbers and corrected times.
+
+    Args:
+        words (np.ndarray): The hit words.
+        lut_ft_ns (np.ndarray): Fine time correction of every bin in ns.
+
+    Returns
+    -------
+        Tuple[np.ndarray, np.ndarray]: The channel numbers and corrected
+            times.
+    """
+    words = words.astype(np.int64)
+    ch = (words & 0x1FC00000) >> 22
+    ct = ((words & 0x000007FF) << 1) + ((words & 0x00200000) != 0)
+    ft = (words & 0x001FF000) >> 12
+
+    return ch, _COARSE_NS[ct] - lut_ft_ns[ft]
+
+
 def average_dlm_data(
     mean_expected: int,
     infile: str = None,
@@ -463,7 +765,8 @@ def average_dlm_data(
         with open(infile) as f:
             lines = f.readlines()
 
-    data = []
+    channels = []
+    delays = []
     for line in lines:
         line = line.strip()
         if not line or line.startswith("#"):
@@ -474,70 +777,136 @@ def average_dlm_data(
         try:
             channel = int(columns[0])
             delay = float(columns[1])
-            data.append((channel, delay))
         except ValueError:
             continue
+        channels.append(channel)
+        delays.append(delay)
 
-    results = []
-    buffer = []
-    tmp = []
-    prev_channel = data[0][0]
-    data_ok = False
-    skipped_entries = 0
-
-    def flush_hist():
-        if len(tmp) == n_channels:
-            results.append(" ".join(f"{c} {v:.5f}" for c, v in tmp))
-        else:
-            raise ValueError(
-                f"Expected {n_channels} channels in hist, got {len(tmp)}"
-            )
-
-    for channel, delay in data:
-        # Check channel rollover
-        if channel != prev_channel:
-            if data_ok and len(buffer) == mean_expected:
-                avg = sum(d for _, d in buffer) / mean_expected
-                tmp.append((prev_channel, avg))
-            else:
-                skipped_entries += len(buffer)
-
-            # Output when rollover and data_ok
-            if data_ok and channel < prev_channel:
-                flush_hist()
-                tmp.clear()
-            elif not data_ok and channel < prev_channel:
-                data_ok = True
-                if verbose:
-                    print(
-                        f"# INFO: SKIPPED {skipped_entries} ENTRIES, MEAN EXPECTED = {mean_expected}",
-                    )
-                tmp.clear()
-
-            buffer = [(channel, delay)]
-            prev_channel = channel
-        else:
-            # Otherwise, just append to the buffer
-            buffer.append((channel, delay))
-
-        if len(buffer) == mean_expected and data_ok:
-            # when the buffer is full, calculate the avg
-            avg = sum(d for _, d in buffer) / mean_expected
-            tmp.append((channel, avg))
-            buffer = []
+    if not channels:
+        raise IndexError("no data entries found in the input")
 
-    # Handle the last buffer
-    if data_ok and len(tmp) == n_channels:
-        flush_hist()
+    results = _dlm_hist_lines(
+        np.array(channels, dtype=np.int64),
+        np.array(delays, dtype=np.float64),
+        mean_expected,
+        n_channels,
+        verbose,
+    )
 
     # Write output
+    text = "".join(line + "\n" for line in results)
     if outfile:
         with open(outfile, "w") as f:
-            for line in results:
-                f.write(line + "\n")
+            f.write(text)
     else:
-        for line in results:
-            print(line)
+        sys.stdout.write(text)
+
+
+def _dlm_hist_lines(
+    ch: np.ndarray,
+    d: np.ndarray,
+    mean_expected: int,
+    n_channels: int,
+    verbose: bool,
+) -> list[str]:
+    """
+    Average the fine time data and group the means into histogram lines.
+
+    Args:
+        ch (np.ndarray): Channel of each entry.
+        d (np.ndarray): Fine time of each entry.
+        mean_expected (int): Expected number of hits per mean value.
+        n_channels (int): Number of channels expected.
+        verbose (bool): If True, prints debug information.
+
+    Returns
+    -------
+        list[str]: One line per complete histogram.
+
+    Raises
+    ------
+        ValueError: If a histogram does not have `n_channels` means.
+    """
+    # Runs of consecutive entries with the same channel
+    run_starts = np.flatnonzero(np.diff(ch)) + 1
+    run_starts = np.concatenate(([0], run_starts))
+    run_lens = np.diff(np.append(run_starts, len(ch)))
+    run_channels = ch[run_starts]
+    # A run starting with a lower channel than the previous one starts a
+    # new histogram
+    rollover = np.zeros(len(run_starts), dtype=bool)
+    rollover[1:] = run_channels[1:] < run_channels[:-1]
+
+    # Everything before the first rollover is skipped
+    first = np.flatnonzero(rollover)
+    if len(first) == 0:
+        return []
+    first = first[0]
+    if verbose:
+        print(
+            f"# INFO: SKIPPED {run_starts[first]} ENTRIES, MEAN EXPECTED = {mean_expected}",
+        )
+    run_starts = run_starts[first:]
+    run_lens = run_lens[first:]
+    run_channels = run_channels[first:]
+    hist_ids = np.cumsum(rollover[first:]) - 1
+
+    # Every run yields one mean per full block of mean_expected entries,
+    # incomplete blocks are dropped
+    n_blocks = run_lens // mean_expected
+    block_run = np.repeat(np.arange(len(n_blocks)), n_blocks)
+    block_offsets = np.cumsum(n_blocks) - n_blocks
+    block_starts = run_starts[block_run] + mean_expected * (
+        np.arange(len(block_run)) - block_offsets[block_run]
+    )
+    block_means = _block_means(d, block_starts, mean_expected)
+    block_channels = run_channels[block_run]
+    block_hist = hist_ids[block_run]
+
+    # Each histogram must have exactly n_channels means; only the last one
+    # may be incomplete, in which case it is dropped
+    n_hists = hist_ids[-1] + 1
+    hist_sizes = np.bincount(block_hist, minlength=n_hists)
+    bad = np.flatnonzero(hist_sizes[:-1] != n_channels)
+    if len(bad):
+        raise ValueError(
+            f"Expected {n_channels} channels in hist, got {hist_sizes[bad[0]]}"
+        )
+    if hist_sizes[-1] != n_channels:
+        n_hists -= 1
+
+    fields = map(
+        "%d %.5f".__mod__,
+        zip(
+            block_channels[: n_hists * n_channels].tolist(),
+            block_means[: n_hists * n_channels].tolist(),
+        ),
+    )
+    return [" ".join(hist) for hist in zip(*[fields] * n_channels)]
+
+
+def _block_means(
+    values: np.ndarray, block_starts: np.ndarray, block_size: int
+) -> np.ndarray:
+    """
+    Mean of the blocks of `block_size` values starting at `block_starts`.
+
+    The values in each block are added up one at a time, in order, so the
+    result is the same as for the builtin `sum`.
+
+    Args:
+        values (np.ndarray): Values to average.
+        block_starts (np.ndarray): Index of the first value of each block.
+        block_size (int): Number of values in each block.
+
+    Returns
+    -------
+        np.ndarray: The mean of each block.
+    """
+    total = np.zeros(len(block_starts), dtype=np.float64)
+    for i in range(block_size):
+        total += values[block_starts + i]
+    return total / block_size
 
 
 def decode_usb_tdc(
@@ -566,166 +935,336 @@ def decode_usb_tdc(
     -------
         None: This function does not return a value. It writes results to a file or prints them to the console.
     """
+    # Output lines, written in one go at the end
+    lines = []
 
-    def read_40bit_word(fin):
-        raw = fin.read(5)
-        if len(raw) != 5:
-            return None
-        return int.from_bytes(raw, "big")
-
-    def output(line: str):
-        print(line, file=out) if out else print(line)
-
-    def emit_time_differences(times, mode):
-        parts = []
-        for i in range(len(times), 0, -1):
-            for j in range(i - 1):
-                diff = times[i - 1] - times[j]
-                if abs(diff) > 11_000:
-                    diff -= EPOC_UNIT if diff > 0 else -EPOC_UNIT
-                if abs(diff) > 11_000:
-                    raise ValueError(f"Time diff overflow: {diff:.4f}")
-                parts.append(f"{i - 1}.{j} {abs(diff):11.5f}")
-        parts.append(str(mode))
-        output(" ".join(parts))
-
-    def emit_placeholder_block(mode):
-        parts = [
-            f"{i - 1}.{j} {0.0:11.5f}"
-            for i in range(MAX_TDC_CHANNEL, 0, -1)
-            for j in range(i - 1)
-        ]
-        parts.append(str(mode))
-        output(" ".join(parts))
-
-    # Open output file if needed
-    out = open(outfile, "w") if outfile else None
+    def info(line: str):
+        # Keep the messages in order with the output lines on stdout
+        if out:
+            print(line)
+        else:
+            lines.append(line)
 
-    try:
-        with open(infile, "rb") as fin:
-            # Check for optional OK\r\n header
-            header = int.from_bytes(fin.read(4), "big")
-            if header != MESSAGE_OK:
-                fin.seek(0)
-
-            # Setup state
-            tdc_time_history = [0.0] * MAX_TDC_CHANNEL
-            tdc_hit_count = [0] * MAX_TDC_CHANNEL
-            tdc_counter = 0
-            old_tdc_time = 0.0
-            first_hit = True
+    with ExitStack() as stack:
+        # Open output file if needed
+        out = stack.enter_context(open(outfile, "w")) if outfile else None
+
+        try:
+            with open(infile, "rb") as fin:
+                # A view, so that skipping the header does not copy the data
+                data = memoryview(fin.read())
+            # Skip the optional OK\r\n header
+            if int.from_bytes(data[:4], "big") == MESSAGE_OK:
+                data = data[4:]
+            words = _unpack_40bit_words(data)
+
+            # State carried over from one chunk of words to the next:
+            # tdc_counter, first_hit, skip_events and the hit count of each
+            # channel; the time of the last hit and of each channel.
+            state = [0, 1, skip_events] + [0] * MAX_TDC_CHANNEL
+            time_state = [0.0] * (1 + MAX_TDC_CHANNEL)
+            if njit is None:
+                # Plain Python is much faster on lists than on arrays
+                words = words.tolist()
+            else:
+                state = np.array(state, dtype=np.int64)
+                time_state = np.array(time_state, dtype=np.float64)
+                words = words.astype(np.int64)
 
             dlm_period = float(dlm_period_ns)
             dlm_diff = float(max_diff_ns)
+            placeholders = [
+                _USB_TDC_LINE % (*_USB_TDC_NO_DIFFS, mode) for mode in (0, 1)
+            ]
+
+            for lo in range(0, len(words), _USB_CHUNK):
+                chunk = words[lo : lo + _USB_CHUNK]
+                if njit is None:
+                    kinds = [0] * (2 * len(chunk))
+                    values = [0] * (2 * len(chunk))
+                    times = [0.0] * (2 * MAX_TDC_CHANNEL * len(chunk))
+                else:
+                    kinds = np.empty(2 * len(chunk), dtype=np.int64)
+                    values = np.empty(2 * len(chunk), dtype=np.int64)
+                    times = np.empty(2 * MAX_TDC_CHANNEL * len(chunk))
+
+                n_items = _scan_usb_tdc_words(
+                    chunk,
+                    dlm_period,
+                    dlm_diff,
+                    verbose,
+                    state,
+                    time_state,
+                    kinds,
+                    values,
+                    times,
+                )
+                kinds = np.asarray(kinds[:n_items])
+                values = np.asarray(values[:n_items])
+                times = np.asarray(times[: MAX_TDC_CHANNEL * n_items])
+
+                # The time differences of all the blocks at once
+                blocks = np.flatnonzero(kinds == _USB_BLOCK)
+                block_lines, overflow = _usb_time_difference_lines(
+                    times.reshape(-1, MAX_TDC_CHANNEL)[blocks],
+                    values[blocks],
+                )
 
-            while True:
-                dataword = read_40bit_word(fin)
-                if dataword is None:
-                    break
+                n_blocks = 0
+                for kind, value in zip(kinds.tolist(), values.tolist()):
+                    if kind == _USB_BLOCK:
+                        if n_blocks == len(block_lines):
+                            raise ValueError(overflow)
+                        lines.append(block_lines[n_blocks])
+                        n_blocks += 1
+                    elif kind == _USB_PLACEHOLDER:
+                        lines.append(placeholders[value])
+                    elif kind == _USB_TEMPERATURE:
+                        lines.append(_usb_temperature_line(value))
+                    elif kind == _USB_INFO:
+                        info(_USB_INFO_MESSAGES[value])
+                    elif kind == _USB_INCOMPLETE:
+                        info(f"# INFO: Incomplete block ({value})")
+                    elif kind == _USB_BAD_FINE:
+                        raise ValueError("Invalid fine time.")
+                    else:
+                        raise ValueError(f"Broken channel: 0x{value:010x}")
+
+        finally:
+            if lines:
+                (out or sys.stdout).write("\n".join(lines) + "\n")
+
+
+@_jit
+def _scan_usb_tdc_words(
+    words,
+    dlm_period,
+    dlm_diff,
+    verbose,
+    state,
+    time_state,
+    kinds,
+    values,
+    times,
+):
+    """Run the USB TDC block state machine over a chunk of data words.
+
+    Compiled with Numba when it is installed. Without it, this runs as
+    plain Python on lists.
+
+    Every output line or message becomes an item: its kind (one of the
+    _USB_* codes), a value (the mode of a block, the data word of a
+    temperature or of an error, the info message or the hit count of an
+    incomplete block) and, for blocks, the hit time of each channel.
+    Stops after an error item.
 
-                channel = (dataword >> 36) & 0xF
+    Args:
+        words: The 40-bit data words.
+        dlm_period: The delimiter period in ns.
+        dlm_diff: The maximum time difference within a block in ns.
+        verbose: If True, also adds the info messages.
+        state: The integer state, updated in place.
+        time_state: The time state, updated in place.
+        kinds: Filled with the kind of each item.
+        values: Filled with the value of each item.
+        times: Filled with the hit times of each block item.
 
-                # --- TDC Hit ---
-                if channel < MAX_TDC_CHANNEL:
-                    coarse = (dataword >> 18) & 0x3FFFF
-                    fine = dataword & 0x3FFFF
-                    if fine > COARSE_UNIT:
-                        raise ValueError("Invalid fine time.")
+    Returns
+    -------
+        int: The number of items.
+    """
+    # Time windows of the block classification
+    block_max = dlm_diff * 1.10
+    period_min = dlm_period * 0.90
+    period_max = dlm_period * 1.10
+    long_period_min = 2 * dlm_period * 0.90
+    long_period_max = 2 * dlm_period * 1.10
+
+    n_items = 0
+    tdc_counter = state[0]
+    first_hit = state[1]
+    skip_events = state[2]
+    old_tdc_time = time_state[0]
+
+    for dataword in words:
+        channel = (dataword >> 36) & 0xF
+
+        # --- TDC Hit ---
+        if channel < MAX_TDC_CHANNEL:
+            coarse = (dataword >> 18) & 0x3FFFF
+            fine = dataword & 0x3FFFF
+            if fine > COARSE_UNIT:
+                kinds[n_items] = _USB_BAD_FINE
+                values[n_items] = dataword
+                n_items += 1
+                break
+
+            tdc_time = (coarse * COARSE_UNIT + fine) / 1000.0
+
+            if first_hit:
+                time_diff = -1.0
+                first_hit = 0
+            else:
+                time_diff = tdc_time - old_tdc_time
+                if time_diff < 0:
+                    if abs(time_diff) > dlm_diff:
+                        time_diff += EPOC_UNIT
+                else:
+                    time_diff = abs(time_diff)
+
+            old_tdc_time = tdc_time
+
+            # Classify DLM mode
+            if time_diff <= block_max:
+                state[3 + channel] += 1
+                time_state[1 + channel] = tdc_time
+                tdc_counter += 1
+                continue
+            elif period_min < time_diff <= period_max:
+                mode = 0  # MD_PERIOD
+            elif long_period_min < time_diff <= long_period_max:
+                mode = 1  # MD_LONG_PERIOD
+            elif time_diff <= period_min:
+                if verbose:
+                    kinds[n_items] = _USB_INFO
+                    values[n_items] = _USB_INFO_SPURIOUS
+                    n_items += 1
+                continue
+            else:
+                continue  # Unknown timing
+
+            # Emit block
+            if tdc_counter == MAX_TDC_CHANNEL:
+                single_hits = True
+                for i in range(MAX_TDC_CHANNEL):
+                    if state[3 + i] != 1:
+                        single_hits = False
+                if skip_events:
+                    skip_events -= 1
+                    if verbose:
+                        kinds[n_items] = _USB_INFO
+                        values[n_items] = _USB_INFO_SKIPPED
+                        n_items += 1
+                elif single_hits:
+                    kinds[n_items] = _USB_BLOCK
+                    values[n_items] = mode
+                    for i in range(MAX_TDC_CHANNEL):
+                        times[MAX_TDC_CHANNEL * n_items + i] = time_state[1 + i]
+                    n_items += 1
+                else:
+                    if verbose:
+                        kinds[n_items] = _USB_INFO
+                        values[n_items] = _USB_INFO_MULTIPLE
+                        n_items += 1
+                    kinds[n_items] = _USB_PLACEHOLDER
+                    values[n_items] = mode
+                    n_items += 1
+            else:
+                if verbose:
+                    kinds[n_items] = _USB_INCOMPLETE
+                    values[n_items] = tdc_counter
+                    n_items += 1
+                kinds[n_items] = _USB_PLACEHOLDER
+                values[n_items] = mode
+                n_items += 1
+
+            # Reset, then start a new block
+            for i in range(MAX_TDC_CHANNEL):
+                state[3 + i] = 0
+                time_state[1 + i] = 0.0
+            state[3 + channel] = 1
+            time_state[1 + channel] = tdc_time
+            tdc_counter = 1
+
+        # --- Temperature ---
+        elif channel == TEMP_CHANNEL:
+            kinds[n_items] = _USB_TEMPERATURE
+            values[n_items] = dataword
+            n_items += 1
+
+        # --- Error ---
+        else:
+            kinds[n_items] = _USB_BAD_CHANNEL
+            values[n_items] = dataword
+            n_items += 1
+            break
 
-                    tdc_time = (coarse * COARSE_UNIT + fine) / 1000.0
+    state[0] = tdc_counter
+    state[1] = first_hit
+    state[2] = skip_events
+    time_state[0] = old_tdc_time
+    return n_items
 
-                    if first_hit:
-                        time_diff = -1
-                        first_hit = False
-                    else:
-                        time_diff = tdc_time - old_tdc_time
-                        if time_diff < 0:
-                            time_diff += (
-                                EPOC_UNIT if abs(time_diff) > dlm_diff else 0
-                            )
-                        else:
-                            time_diff = abs(time_diff)
-
-                    old_tdc_time = tdc_time
-
-                    # Classify DLM mode
-                    if time_diff <= dlm_diff * 1.10:
-                        tdc_hit_count[channel] += 1
-                        tdc_time_history[channel] = tdc_time
-                        tdc_counter += 1
-                        continue
-                    elif dlm_period * 0.90 < time_diff <= dlm_period * 1.10:
-                        mode = 0  # MD_PERIOD
-                    elif (
-                        2 * dlm_period * 0.90
-                        < time_diff
-                        <= 2 * dlm_period * 1.10
-                    ):
-                        mode = 1  # MD_LONG_PERIOD
-                    elif time_diff <= dlm_period * 0.90:
-                        if verbose:
-                            print("# INFO: Spurious hit between blocks")
-                        continue
-                    else:
-                        continue  # Unknown timing
-
-                    # Emit block
-                    if tdc_counter == MAX_TDC_CHANNEL:
-                        if skip_events:
-                            skip_events -= 1
-                            if verbose:
-                                print("# INFO: Skipped block")
-                        elif all(c == 1 for c in tdc_hit_count):
-                            emit_time_differences(tdc_time_history, mode)
-                        else:
-                            if verbose:
-                                print("# INFO: Multiple hits detected")
-                            emit_placeholder_block(mode)
-                    else:
-                        if verbose:
-                            print(f"# INFO: Incomplete block ({tdc_counter})")
-                        emit_placeholder_block(mode)
-
-                    # Reset
-                    tdc_time_history = [0.0] * MAX_TDC_CHANNEL
-                    tdc_hit_count = [0] * MAX_TDC_CHANNEL
-                    tdc_counter = 0
-
-                    # Start new block
-                    tdc_hit_count[channel] += 1
-                    tdc_time_history[channel] = tdc_time
-                    tdc_counter += 1
-
-                # --- Temperature ---
-                elif channel == TEMP_CHANNEL:
-                    i2c_addr = (dataword >> 24) & 0xFF
-                    i2c_status = (dataword >> 16) & 0xFF
-                    i2c_data = dataword & 0xFFFF
-                    temp = -66.6666
-
-                    if i2c_status == 0:
-                        if i2c_addr == I2C_MAX31726:
-                            temp = i2c_data * I2C_MAX31726_SCALE
-                            label = "MAX31726"
-                        elif i2c_addr == I2C_LM75B:
-                            temp = (
-                                i2c_data // I2C_LM75B_DIVISOR
-                            ) * I2C_LM75B_SCALE
-                            label = "LM75B"
-                        else:
-                            label = "unknown I2C"
-                    else:
-                        label = "error"
 
-                    output(f"{temp:8.4f} # TMP {label}")
+def _usb_time_difference_lines(
+    times: np.ndarray, modes: np.ndarray
+) -> tuple[list[str], str | None]:
+    """Format the time differences between the channels of USB TDC blocks.
 
-                # --- Error ---
-                elif channel > MAX_TDC_CHANNEL:
-                    raise ValueError(f"Broken channel: 0x{dataword:010x}")
+    Args:
+        times (np.ndarray): The hit time of each channel, one row per
+            block.
+        modes (np.ndarray): The mode of each block.
 
-    finally:
-        if out:
-            out.close()
+    Returns
+    -------
+        Tuple[list[str], str | None]: The output line of each block, up to
+            the first block with a time difference overflow, and the error
+            message for that block (None if there is none).
+    """
+    diffs = times[:, _USB_TDC_PAIRS_I] - times[:, _USB_TDC_PAIRS_J]
+    # Undo the epoch wrap between the two hits
+    diffs = np.where(
+        np.abs(diffs) > 11_000,
+        np.where(diffs > 0, diffs - EPOC_UNIT, diffs + EPOC_UNIT),
+        diffs,
+    )
+
+    overflow = np.abs(diffs) > 11_000
+    bad = np.flatnonzero(overflow.any(axis=1))
+    n_ok = bad[0] if len(bad) else len(diffs)
+    message = None
+    if len(bad):
+        diff = diffs[n_ok, np.argmax(overflow[n_ok])]
+        message = f"Time diff overflow: {diff:.4f}"
+
+    lines = list(
+        map(
+            _USB_TDC_LINE.__mod__,
+            zip(*np.abs(diffs[:n_ok]).T.tolist(), modes[:n_ok].tolist()),
+        )
+    )
+    return lines, message
+
+
+def _usb_temperature_line(dataword: int) -> str:
+    """Format a USB TDC temperature word as an output line.
+
+    Args:
+        dataword (int): The temperature data word.
+
+    Returns
+    -------
+        str: The temperature and the sensor type.
+    """
+    i2c_addr = (dataword >> 24) & 0xFF
+    i2c_status = (dataword >> 16) & 0xFF
+    i2c_data = dataword & 0xFFFF
+    temp = -66.6666
+
+    if i2c_status == 0:
+        if i2c_addr == I2C_MAX31726:
+            temp = i2c_data * I2C_MAX31726_SCALE
+            label = "MAX31726"
+        elif i2c_addr == I2C_LM75B:
+            temp = (i2c_data // I2C_LM75B_DIVISOR) * I2C_LM75B_SCALE
+            label = "LM75B"
+        else:
+            label = "unknown I2C"
+    else:
+        label = "error"
+
+    return f"{temp:8.4f} # TMP {label}"
 
 
 def average_usb_tdc_data(
@@ -742,92 +1281,95 @@ def average_usb_tdc_data(
         infile (str): Input file path. If None, reads from stdin.
         outfile (str): Output file path. If None, writes to stdout.
         verbose (bool): If True, prints per-channel min/max/diff info.
-    """
-    import sys
-
-    import numpy as np
-
-    input_opener = open(infile) if infile else sys.stdin
-    output_opener = open(outfile, "w") if outfile else sys.stdout
-
-    with input_opener as input_stream, output_opener as output_stream:
 
-        def emit(line: str):
-            print(line, file=output_stream)
+    Raises
+    ------
+        ValueError: If mean_expected is not positive.
+    """
+    if mean_expected <= 0:
+        raise ValueError("mean_expected must be a positive integer")
 
-        # Step 1: Read the first valid line to infer number of pairs
-        for raw_line in input_stream:
-            line = raw_line.strip()
-            if not line or line.startswith("#"):
-                continue
-            parts = line.split()
+    if infile:
+        with open(infile) as input_stream:
+            raw_lines = input_stream.readlines()
+    else:
+        raw_lines = sys.stdin.readlines()
+
+    # Step 1: Parse all the lines with the same number of pairs as the first
+    # valid line
+    num_pairs = None
+    ch_labels = None
+    rows = []
+    for raw_line in raw_lines:
+        line = raw_line.strip()
+        if not line or line.startswith("#"):
+            continue
+        parts = line.split()
+        if num_pairs is None:
             if len(parts) < 3 or (len(parts) - 1) % 2 != 0:
                 continue
             num_pairs = (len(parts) - 1) // 2
-            first_line = parts
-            break
-        else:
-            raise ValueError("No valid data lines found in input.")
-
-        # Step 2: Initialize state
-        data_read = data_valid = 0
-        sums = np.zeros(num_pairs, dtype=np.float64)
-        diff_min = np.full(num_pairs, np.inf, dtype=np.float64)
-        diff_max = np.zeros(num_pairs, dtype=np.float64)
-        ch_labels = [None] * num_pairs
-
-        def process(parts):
-            nonlocal data_read, data_valid, sums
-            try:
-                diffs = np.empty(num_pairs, dtype=np.float64)
-                for i in range(num_pairs):
-                    label, val = parts[2 * i], float(parts[2 * i + 1])
-                    if ch_labels[i] is None:
-                        ch_labels[i] = label
-                    diffs[i] = val
-                total = diffs.sum()
-            except Exception:
-                return  # skip malformed line
-
-            data_read += 1
-            if total > 0.0:
-                data_valid += 1
-                sums += diffs
-
-            if data_read == mean_expected:
-                means = (
-                    sums / data_valid if data_valid > 0 else np.zeros_like(sums)
-                )
-                output_parts = [
-                    f"{ch_labels[i]} {means[i]:11.5f}" for i in range(num_pairs)
-                ]
-                emit("  ".join(output_parts))
-
-                valid_mask = means > 0.0
-                diff_min[valid_mask] = np.minimum(
-                    diff_min[valid_mask], means[valid_mask]
-                )
-                diff_max[valid_mask] = np.maximum(
-                    diff_max[valid_mask], means[valid_mask]
-                )
-
-                data_read = data_valid = 0
-                sums.fill(0.0)
-
-        # Step 3: Process first and remaining lines
-        process(first_line)
+            ch_labels = [None] * num_pairs
+        elif len(parts) != 2 * num_pairs + 1:
+            continue
 
-        for raw_line in input_stream:
-            line = raw_line.strip()
-            if not line or line.startswith("#"):
-                continue
-            parts = line.split()
-            if len(parts) != 2 * num_pairs + 1:
-                continue
-            process(parts)
+        labels = parts[0 : 2 * num_pairs : 2]
+        try:
+            rows.append(list(map(float, parts[1 : 2 * num_pairs : 2])))
+        except ValueError:
+            # Skip malformed line, keeping the labels in front of the
+            # first malformed value
+            for i, val in enumerate(parts[1 : 2 * num_pairs : 2]):
+                try:
+                    float(val)
+                except ValueError:
+                    break
+                if ch_labels[i] is None:
+                    ch_labels[i] = labels[i]
+            continue
+        if None in ch_labels:
+            ch_labels = [
+                label if label is not None else labels[i]
+                for i, label in enumerate(ch_labels)
+            ]
+
+    if num_pairs is None:
+        raise ValueError("No valid data lines found in input.")
+
+    # Step 2: Average every block of mean_expected events, leaving out the
+    # events whose delays do not add up to a positive value
+    n_blocks = len(rows) // mean_expected
+    diffs = np.array(rows[: n_blocks * mean_expected], dtype=np.float64)
+    diffs = diffs.reshape(n_blocks, mean_expected, num_pairs)
+    valid = diffs.sum(axis=2) > 0.0
+    sums = np.zeros((n_blocks, num_pairs), dtype=np.float64)
+    for i in range(mean_expected):
+        # Add the events one at a time, as the sums depend on the order
+        sums += np.where(valid[:, i, None], diffs[:, i], 0.0)
+    data_valid = valid.sum(axis=1)[:, None]
+    means = np.zeros_like(sums)
+    np.divide(sums, data_valid, out=means, where=data_valid > 0)
+
+    output = []
+    if n_blocks:
+        line_format = "  ".join(
+            label.replace("%", "%%") + " %11.5f" for label in ch_labels
+        )
+        output = [line_format % tuple(row) for row in means.tolist()]
 
-        if verbose:
-            for i in range(num_pairs):
-                emit(f"# MIN {i} {diff_min[i]:11.5f}")
-                emit(f"# MAX {i} {diff_max[i]:11.5f}")
-                emit(f"# DIF {i} {diff_max[i] - diff_min[i]:11.5f}")
+    if verbose:
+        positive = means > 0.0
+        diff_min = np.where(positive, means, np.inf).min(axis=0, initial=np.inf)
+        diff_max = np.where(positive, means, 0.0).max(axis=0, initial=0.0)
+        for i in range(num_pairs):
+            output.append(f"# MIN {i} {diff_min[i]:11.5f}")
+            output.append(f"# MAX {i} {diff_max[i]:11.5f}")
+            output.append(f"# DIF {i} {diff_max[i] - diff_min[i]:11.5f}")
+
+    # Step 3: Write all the output lines at once
+    text = "".join(line + "\n" for line in output)
+    if outfile:
+        with open(outfile, "w") as output_stream:
+            output_stream.write(text)
+    else:
+        sys.stdout.write(text)
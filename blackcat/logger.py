@@ -4,18 +4,44 @@ Provides a utility function to configure logging for the application.
 It ensures consistent logging behavior across all components.
 """
 
+import atexit
 import logging
+import queue
 import sys
+from logging.handlers import QueueHandler, QueueListener
+
+# Set once the root logger has been configured, so that repeated calls
+# (one per device instance) return immediately.
+_LOGGING_CONFIGURED = False
+
+# Background listener doing the actual I/O for all log records, if
+# `configure_logging` was asked to use a queue.
+_LISTENER: QueueListener | None = None
 
 
 def configure_logging(
-    level=logging.INFO, log_to_file=False, filename="blackcat.log"
+    level=logging.INFO,
+    log_to_file=False,
+    filename="blackcat.log",
+    use_queue=False,
 ):
     """Configure the logging system.
 
-    Ensures consistent logging across all classes.
+    Ensures consistent logging across all classes. Only the first call
+    has an effect; later calls are no-ops.
+
+    By default the stream (and file) handlers are attached to the root
+    logger, so records are written synchronously, in order with any
+    other output. With `use_queue=True`, the root logger only gets a
+    `QueueHandler` and the handlers run behind a `QueueListener` in a
+    background thread, which is stopped at exit.
     """
+    global _LOGGING_CONFIGURED, _LISTENER
+
     # Check if logging is already configured
+    if _LOGGING_CONFIGURED:
+        return
+    _LOGGING_CONFIGURED = True
     if logging.getLogger().hasHandlers():
         return
 
@@ -24,9 +50,24 @@ def configure_logging(
 
     if log_to_file:
         # Append logs to file
-        handlers.append(logging.FileHandler(filename, mode="a"))
+        handlers.append(logging.FileHandler(filename, mode="a", delay=True))
 
-    logging.basicConfig(
-        level=level,
-        format="%(asctime)s - %(levelname)s - %(name)s - %(message)s",
+    formatter = logging.Formatter(
+        "%(asctime)s - %(levelname)s - %(name)s - %(message)s"
     )
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    root = logging.getLogger()
+    root.setLevel(level)
+
+    if not use_queue:
+        for handler in handlers:
+            root.addHandler(handler)
+        return
+
+    log_queue = queue.SimpleQueue()
+    _LISTENER = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _LISTENER.start()
+    atexit.register(_LISTENER.stop)
+    root.addHandler(QueueHandler(log_queue))
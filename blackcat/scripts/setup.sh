@@ -3,6 +3,7 @@
 # DEFAULTS
 VERBOSE=0
 CONFIG_FILE="config.cfg"
+REASSERT_ONLY=0
 
 # Parse input arguments
 while [[ $# -gt 0 ]]; do
@@ -15,6 +16,10 @@ while [[ $# -gt 0 ]]; do
             CONFIG_FILE="$2"
             shift 2
             ;;
+        --reassert_only|-r)
+            REASSERT_ONLY=1
+            shift
+            ;;
         -*)
             echo "Unknown option: $1"
             exit 1
@@ -55,39 +60,45 @@ fi
 
 log "TDC IDs: $(echo $TDC_IDS | tr '\n' ' ')"
 
-if [ -z "$TOMCAT_IDS" ]; then
-	log "No TOMcat IDs found. Skipping TOMcat setup..."
-else
-	# address setup: we assign TOMcat bit 0 in multicast2 mode
-	log "TOMcat IDs: $(echo $TOMCAT_IDS | tr '\n' ' ')"
-	for id in $TOMCAT_IDS; do
-		DOGMA_IP=$BASE_IP.$id dog write 0xff000000 34 0xfe000001
-		DOGMA_IP=$BASE_IP.$id dog write 0xff000000 32 $id
-	done
-fi
-
 # Convert to array
 mapfile -t TDC_ARRAY < <(echo "$TDC_IDS")
 LDR_TDC_ID="${TDC_ARRAY[0]}"
 FLW_TDC_IDS=("${TDC_ARRAY[@]:1}")
 
-# all modules with TDC get bit 1 in multicast2 mode
-log "Setting up multicast2 mode for TDC modules..."
-
-# Configure leader (gets bit 23 in multicast2 mode)
-DOGMA_IP=$BASE_IP.$LDR_TDC_ID dog write 0xff000000 34 0xfe800002
-DOGMA_IP=$BASE_IP.$LDR_TDC_ID dog write 0xff000000 32 $LDR_TDC_ID
-
-# Configure followers (get bit 22 in multicast2 mode)
-for id in "${FLW_TDC_IDS[@]}"; do
-    DOGMA_IP=$BASE_IP.$id dog write 0xff000000 34 0xfe400002
-    DOGMA_IP=$BASE_IP.$id dog write 0xff000000 32 $id
-done
+# The module addresses are not touched by the calibration: when only
+# reasserting the setup (e.g. right after calibrating) skip assigning them.
+if [ "$REASSERT_ONLY" -eq 1 ]; then
+	log "Reasserting setup only. Skipping address assignment..."
+else
+	if [ -z "$TOMCAT_IDS" ]; then
+		log "No TOMcat IDs found. Skipping TOMcat setup..."
+	else
+		# address setup: we assign TOMcat bit 0 in multicast2 mode
+		log "TOMcat IDs: $(echo $TOMCAT_IDS | tr '\n' ' ')"
+		for id in $TOMCAT_IDS; do
+			DOGMA_IP=$BASE_IP.$id dog write 0xff000000 34 0xfe000001
+			DOGMA_IP=$BASE_IP.$id dog write 0xff000000 32 $id
+		done
+	fi
+
+	# all modules with TDC get bit 1 in multicast2 mode
+	log "Setting up multicast2 mode for TDC modules..."
+
+	# Configure leader (gets bit 23 in multicast2 mode)
+	DOGMA_IP=$BASE_IP.$LDR_TDC_ID dog write 0xff000000 34 0xfe800002
+	DOGMA_IP=$BASE_IP.$LDR_TDC_ID dog write 0xff000000 32 $LDR_TDC_ID
+
+	# Configure followers (get bit 22 in multicast2 mode)
+	for id in "${FLW_TDC_IDS[@]}"; do
+	    DOGMA_IP=$BASE_IP.$id dog write 0xff000000 34 0xfe400002
+	    DOGMA_IP=$BASE_IP.$id dog write 0xff000000 32 $id
+	done
 
-# check things
-if [ "$VERBOSE" -eq 1 ]; then
-    dog -b read 0xff000000 32
-    dog -b read 0xff000000 34
+	# check things
+	if [ "$VERBOSE" -eq 1 ]; then
+	    dog -b read 0xff000000 32
+	    dog -b read 0xff000000 34
+	fi
 fi
 
 # disable DLMs (all modules)
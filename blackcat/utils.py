@@ -1,23 +1,114 @@
 """Utility functions used across the BlackCat project."""
 
+import configparser
+import ctypes
+import ctypes.util
+import errno
 import logging
+import mmap
+import os
+import select
+import selectors
 import socket
 import subprocess
+import sys
 import threading
+from collections.abc import Mapping, Sequence
+from functools import lru_cache
 from importlib.resources import files
 from pathlib import Path
 
 
+@lru_cache(maxsize=1)
 def get_default_config_path() -> Path:
-    """Retrieve the path to the default config file included in the package."""
+    """Retrieve the path to the default config file included in the package.
+
+    The path does not change while the process runs, so it is only looked
+    up once.
+    """
     return files("blackcat").joinpath("config.cfg")
 
 
+@lru_cache(maxsize=32)
+def _load_config(config_file: str, mtime_ns: int) -> configparser.ConfigParser:
+    """Load a configuration file, caching the result.
+
+    The modification time is part of the cache key, so an edited file is
+    read again. The same parser is shared by every device using this
+    configuration file, so it must not be modified. Use
+    `_load_config.cache_clear()` to drop the cache.
+
+    Args:
+        config_file (str): Path to the configuration file.
+        mtime_ns (int): Modification time of the file in nanoseconds.
+
+    Returns
+    -------
+        configparser.ConfigParser: The parsed configuration.
+    """
+    config = configparser.ConfigParser()
+    with open(config_file) as f:
+        config.read_file(f)
+    return config
+
+
+# Size of the chunks in which the output of a script is read.
+_PIPE_READ_SIZE = 64 * 1024
+
+
+def _log_script_output(
+    process: subprocess.Popen, logger: logging.Logger, process_name: str
+) -> None:
+    """Log the stdout and stderr of `process` until both are closed.
+
+    Both pipes are read as their data arrives, so a script writing a lot
+    to one of them cannot block while the other one is being read. Every
+    output line is logged as its own record: stdout as debug messages and
+    stderr as errors. A line split across reads is logged once complete.
+    """
+    formats = {
+        process.stdout.fileno(): (logging.DEBUG, "%s: %s"),
+        process.stderr.fileno(): (logging.ERROR, "%s ERROR: %s"),
+    }
+    # Output that does not end with a newline yet, per pipe
+    pending = {fd: b"" for fd in formats}
+
+    def log_lines(fd: int, lines: list[bytes]) -> None:
+        level, fmt = formats[fd]
+        if logger.isEnabledFor(level):
+            for line in lines:
+                logger.log(
+                    level,
+                    fmt,
+                    process_name,
+                    line.decode(errors="replace").strip(),
+                )
+
+    with selectors.DefaultSelector() as selector:
+        for fd in formats:
+            selector.register(fd, selectors.EVENT_READ)
+        while selector.get_map():
+            for key, _ in selector.select():
+                fd = key.fd
+                data = os.read(fd, _PIPE_READ_SIZE)
+                if not data:
+                    # Pipe closed: log what is left
+                    selector.unregister(fd)
+                    if pending[fd]:
+                        log_lines(fd, [pending[fd]])
+                    continue
+                *lines, pending[fd] = (pending[fd] + data).split(b"\n")
+                log_lines(fd, lines)
+    process.stdout.close()
+    process.stderr.close()
+
+
 def run_shell_script(
     script_path: str,
-    arguments: list[str] | None = None,
+    arguments: Sequence[str] | None = None,
     logger: logging.Logger | None = None,
     process_name: str = "",
+    env: Mapping[str, str] | None = None,
 ) -> None:
     """Run a shell script and logs its output in real-time.
 
@@ -25,10 +116,13 @@ def run_shell_script(
     ---------
     - script_path : str
         Path to the script to execute.
-    - arguments : list, optional
-        List of command-line arguments to pass.
+    - arguments : list or tuple, optional
+        Command-line arguments to pass.
     - logger : logging.Logger, optional
         Logger instance to log messages.
+    - env : Mapping[str, str], optional
+        Environment for the script. If None, the script inherits the
+        environment of this process.
     """
     if logger is None:
         logger = logging.getLogger(__name__)
@@ -36,31 +130,34 @@ def run_shell_script(
     if process_name == "":
         process_name = "PROCESS"
 
-    # Ensure arguments is always a list
+    # Ensure arguments is always a sequence
     if arguments is None:
-        arguments = []
+        arguments = ()
     elif isinstance(arguments, str):
         # Convert string to list (safe for space-separated args)
         arguments = arguments.split()
 
-    # Construct command
-    cmd = [script_path] + arguments
+    # Construct command. The script is executed directly (no shell), by
+    # its full path, which is what lets subprocess use posix_spawn.
+    cmd = [script_path, *arguments]
 
-    logger.debug(f"{process_name}: Running script: {' '.join(cmd)}")
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("%s: Running script: %s", process_name, " ".join(cmd))
 
     try:
-        # Start subprocess
+        # Start subprocess. With close_fds=False (our own descriptors are
+        # non-inheritable anyway) subprocess can use posix_spawn instead of
+        # fork + exec, since script_path is a full path.
         process = subprocess.Popen(
-            cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
+            cmd,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            close_fds=False,
+            env=env,
         )
 
-        # Log stdout in real-time
-        for line in process.stdout:
-            logger.debug(f"{process_name}: {line.strip()}")
-
-        # Log stderr in real-time
-        for line in process.stderr:
-            logger.error(f"{process_name} ERROR: {line.strip()}")
+        # Log stdout and stderr in real-time
+        _log_script_output(process, logger, process_name)
 
         # Ensure process completes
         process.wait()
@@ -71,19 +168,118 @@ def run_shell_script(
 
     except subprocess.CalledProcessError as e:
         logger.error(
-            f"{process_name} ERROR: Script '{script_path}' "
-            f"failed with error code {e.returncode}."
+            "%s ERROR: Script '%s' failed with error code %d.",
+            process_name,
+            script_path,
+            e.returncode,
         )
         raise  # Re-raise for higher-level handling
 
     except Exception as e:
         logger.error(
-            f"{process_name} ERROR: Unexpected error in script "
-            f"'{script_path}': {e}"
+            "%s ERROR: Unexpected error in script '%s': %s",
+            process_name,
+            script_path,
+            e,
         )
         raise  # Re-raise unexpected errors
 
 
+# recvmmsg(2) from the C library, to receive several UDP packets with a
+# single syscall. None where it is not available (e.g. macOS).
+try:
+    _LIBC = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+    _recvmmsg = _LIBC.recvmmsg
+except (AttributeError, OSError, TypeError):
+    _recvmmsg = None
+
+
+class _IOVec(ctypes.Structure):
+    _fields_ = [("iov_base", ctypes.c_void_p), ("iov_len", ctypes.c_size_t)]
+
+
+class _MsgHdr(ctypes.Structure):
+    _fields_ = [
+        ("msg_name", ctypes.c_void_p),
+        ("msg_namelen", ctypes.c_uint32),
+        ("msg_iov", ctypes.POINTER(_IOVec)),
+        ("msg_iovlen", ctypes.c_size_t),
+        ("msg_control", ctypes.c_void_p),
+        ("msg_controllen", ctypes.c_size_t),
+        ("msg_flags", ctypes.c_int),
+    ]
+
+
+class _MMsgHdr(ctypes.Structure):
+    _fields_ = [("msg_hdr", _MsgHdr), ("msg_len", ctypes.c_uint)]
+
+
+if _recvmmsg is not None:
+    _recvmmsg.argtypes = [
+        ctypes.c_int,
+        ctypes.POINTER(_MMsgHdr),
+        ctypes.c_uint,
+        ctypes.c_int,
+        ctypes.c_void_p,
+    ]
+    _recvmmsg.restype = ctypes.c_int
+
+
+class _BatchReceiver:
+    """Receive several UDP packets with one recvmmsg(2) call.
+
+    Every packet is received into its own slot of `packet_size` bytes of
+    `view`: packet `i` starts at `i * packet_size`.
+    """
+
+    def __init__(self, sock: socket.socket, batch: int, packet_size: int):
+        self._fd = sock.fileno()
+        self._batch = batch
+        self._packets = (ctypes.c_char * (batch * packet_size))()
+        self._iovecs = (_IOVec * batch)()
+        self._msgs = (_MMsgHdr * batch)()
+        base = ctypes.addressof(self._packets)
+        for i in range(batch):
+            self._iovecs[i].iov_base = base + i * packet_size
+            self._iovecs[i].iov_len = packet_size
+            self._msgs[i].msg_hdr.msg_iov = ctypes.pointer(self._iovecs[i])
+            self._msgs[i].msg_hdr.msg_iovlen = 1
+        self.view = memoryview(self._packets).cast("B")
+
+    def receive(self) -> list[int]:
+        """Receive the packets already queued, without waiting.
+
+        Returns
+        -------
+            list[int]: The length of each packet received, possibly none.
+
+        Raises
+        ------
+            OSError: If receiving fails.
+        """
+        n = _recvmmsg(
+            self._fd, self._msgs, self._batch, socket.MSG_DONTWAIT, None
+        )
+        if n < 0:
+            err = ctypes.get_errno()
+            if err in (errno.EAGAIN, errno.EWOULDBLOCK, errno.EINTR):
+                return []
+            raise OSError(err, os.strerror(err))
+        msgs = self._msgs
+        return [msgs[i].msg_len for i in range(n)]
+
+
+def _write_all(fd: int, data: memoryview) -> None:
+    """Write all of `data` to the file descriptor `fd`.
+
+    Raises
+    ------
+        OSError: If the data cannot be written.
+    """
+    while data:
+        data = data[os.write(fd, data) :]
+
+
 class UDPListener:
     """UDP Listener helper class to receive and log UDP packets.
 
@@ -107,14 +303,37 @@ class UDPListener:
         The thread running the listener.
     - sock : socket.socket
         The UDP socket used for listening.
+    - rcvbuf : int or None
+        Requested size of the socket receive buffer in bytes, or None to
+        keep the system default.
+    - reuse_port : bool
+        Whether the socket is bound with SO_REUSEPORT.
+    - cpu_affinity : int or list of int or None
+        CPU core(s) the listener thread is pinned to, if any.
+    - error : OSError or None
+        The error that prevented the socket from being set up, if any. It
+        is set before `ready_event`.
     """
 
+    # Largest packet received; longer datagrams are truncated.
+    PACKET_SIZE = 4096
+
+    # The received packets are collected in a buffer of this size before
+    # being written to the output file.
+    WRITE_BUFFER_SIZE = 512 * 1024
+
+    # Maximum number of packets received with a single recvmmsg(2) call.
+    RECV_BATCH = 64
+
     def __init__(
         self,
         port: int,
         out_file: str,
         logger: logging.Logger | None = None,
         process_name: str = "UDP_LISTENER",
+        rcvbuf: int | None = None,
+        reuse_port: bool = False,
+        cpu_affinity: int | Sequence[int] | None = None,
     ):
         """Initialize the UDPListener instance.
 
@@ -130,6 +349,19 @@ class UDPListener:
         - process_name : str, optional
             A name to identify the process in log messages. Defaults to
             "UDP_LISTENER".
+        - rcvbuf : int, optional
+            Requested size of the socket receive buffer in bytes. A larger
+            buffer absorbs bursts without dropping packets; the kernel caps
+            it at net.core.rmem_max. Defaults to None, which keeps the
+            system default.
+        - reuse_port : bool, optional
+            If True, set SO_REUSEPORT (where available) so that several
+            sockets can bind the same port. Defaults to False.
+        - cpu_affinity : int or list of int, optional
+            CPU core(s) to pin the listener thread to, e.g. a core on the
+            NUMA node of the network card. For best results, the card's
+            interrupts should be pinned to the same node through
+            `/proc/irq/<N>/smp_affinity`. Defaults to None (not pinned).
         """
         self.port = port
         self.out_file = out_file
@@ -139,6 +371,38 @@ class UDPListener:
         self.stop_event = threading.Event()  # To stop the listener.
         self.thread = None  # Thread that will run the listener.
         self.sock = None  # UDP socket for listening.
+        self.error = None  # Why the socket could not be set up.
+        self.rcvbuf = rcvbuf
+        self.reuse_port = reuse_port
+        self.cpu_affinity = cpu_affinity
+        # Pipe written to by `stop()` to wake up the listener thread.
+        self._wakeup = None
+
+    def _pin_thread(self):
+        """Pin the calling thread to the cores in `cpu_affinity`.
+
+        Failing to do so is not fatal: the listener just runs unpinned.
+        """
+        cpus = self.cpu_affinity
+        cpus = {cpus} if isinstance(cpus, int) else set(cpus)
+        try:
+            # pid 0 is the calling thread, not the whole process
+            os.sched_setaffinity(0, cpus)
+        except (AttributeError, OSError, ValueError) as e:
+            self.logger.warning(
+                "%s: Cannot pin listener on port %s to CPU(s) %s: %s",
+                self.process_name,
+                self.port,
+                sorted(cpus),
+                e,
+            )
+        else:
+            self.logger.debug(
+                "%s: Listener on port %s pinned to CPU(s) %s",
+                self.process_name,
+                self.port,
+                sorted(cpus),
+            )
 
     def start(self):
         """Start the UDP listener in a background thread.
@@ -146,67 +410,235 @@ class UDPListener:
         This method creates a UDP socket, binds it to the specified port,
         and starts a thread to listen for incoming packets. The received
         data is written to the specified output file.
+
+        Raises
+        ------
+        - OSError
+            If the output file cannot be opened.
         """
         # Make sure the ready_event is clear before starting
         self.ready_event.clear()
+        self.error = None
+
+        # Open the output file here, so that errors surface in the caller
+        # rather than silently ending the listener thread.
+        out_fd = os.open(
+            self.out_file,
+            os.O_WRONLY | os.O_CREAT | os.O_TRUNC | os.O_CLOEXEC,
+            0o644,
+        )
+        self._wakeup = os.pipe()
+        wakeup_fd = self._wakeup[0]
 
         def listen():
-            # Create a UDP socket
-            self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-            # Bind the socket to the address and port.
-            # "0.0.0.0" means that we listen for any packet that shows up
-            # on port `self.port`, no matter where it is from.
-            self.sock.bind(("0.0.0.0", self.port))
-            self.sock.settimeout(2.0)  # Periodic check for stop_event - 2s.
+            if self.cpu_affinity is not None:
+                self._pin_thread()
+            try:
+                # Create a UDP socket
+                self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+                if self.rcvbuf is not None:
+                    self.sock.setsockopt(
+                        socket.SOL_SOCKET, socket.SO_RCVBUF, self.rcvbuf
+                    )
+                    # The kernel silently caps the size at net.core.rmem_max
+                    granted = self.sock.getsockopt(
+                        socket.SOL_SOCKET, socket.SO_RCVBUF
+                    )
+                    if sys.platform == "linux":
+                        # Linux reports twice the size it accepted, the extra
+                        # half being reserved for its own bookkeeping.
+                        granted //= 2
+                    if granted < self.rcvbuf:
+                        self.logger.warning(
+                            "%s: Receive buffer on port %s is only %d bytes "
+                            "instead of %d. Raise net.core.rmem_max to avoid "
+                            "dropping packets in bursts.",
+                            self.process_name,
+                            self.port,
+                            granted,
+                            self.rcvbuf,
+                        )
+                    else:
+                        self.logger.debug(
+                            "%s: Receive buffer on port %s: %d bytes",
+                            self.process_name,
+                            self.port,
+                            granted,
+                        )
+                if self.reuse_port and hasattr(socket, "SO_REUSEPORT"):
+                    self.sock.setsockopt(
+                        socket.SOL_SOCKET, socket.SO_REUSEPORT, 1
+                    )
+                # Bind the socket to the address and port.
+                # "0.0.0.0" means that we listen for any packet that shows
+                # up on port `self.port`, no matter where it is from.
+                self.sock.bind(("0.0.0.0", self.port))
+                # The loop below waits in select(), never in a receive call
+                self.sock.setblocking(False)
+            except OSError as e:
+                # Wake up whoever waits on ready_event right away, with the
+                # reason, instead of letting them time out.
+                self.logger.error(
+                    "%s: Cannot listen on port %s: %s",
+                    self.process_name,
+                    self.port,
+                    e,
+                )
+                if self.sock is not None:
+                    self.sock.close()
+                os.close(out_fd)
+                self.error = e
+                self.ready_event.set()
+                return
 
             self.logger.info(
-                f"{self.process_name}: Listening on port {self.port}, "
-                f"writing to {self.out_file}"
+                "%s: Listening on port %s, writing to %s",
+                self.process_name,
+                self.port,
+                self.out_file,
             )
 
-            # Signal that the listener is ready
-            self.ready_event.set()
+            # The packets are collected back to back in a large buffer,
+            # which is written out once it is nearly full: one write
+            # syscall for many packets. Without recvmmsg, each packet is
+            # received straight into it; with recvmmsg, each one lands in
+            # its own fixed-size slot of the batch buffer first and is
+            # copied over from there. An anonymous mapping is page-aligned.
+            buf = mmap.mmap(-1, self.WRITE_BUFFER_SIZE)
+            view = memoryview(buf)
+            flush_at = self.WRITE_BUFFER_SIZE - self.PACKET_SIZE
+            used = 0
+
+            # Where available, receive many packets with a single syscall
+            receiver = None
+            if _recvmmsg is not None:
+                receiver = _BatchReceiver(
+                    self.sock, self.RECV_BATCH, self.PACKET_SIZE
+                )
+                receive = receiver.receive
+                packets = receiver.view
+
+            # Local names for what the loop uses on every packet
+            stop_is_set = self.stop_event.is_set
+            recv_into = self.sock.recv_into
+            packet_size = self.PACKET_SIZE
+            # Wake up for a packet, or for `stop()` writing to the pipe
+            wait_for = [self.sock, wakeup_fd]
 
-            # Open the output file in binary write mode
-            with open(self.out_file, "wb") as f:
-                while not self.stop_event.is_set():
+            try:
+                # Signal that the listener is ready. The socket is bound, so
+                # any packet from now on is queued by the kernel until the
+                # loop below receives it.
+                self.ready_event.set()
+                while not stop_is_set():
                     try:
-                        # Receive data from the socket
-                        data, _ = self.sock.recvfrom(4096)
-                        f.write(data)
-                    except TimeoutError:
-                        # Timeout occurred, check if we should stop
-                        # because of the stop_event.
-                        continue
+                        if receiver is None:
+                            try:
+                                used += recv_into(view[used:], packet_size)
+                            except BlockingIOError:
+                                pass
+                            else:
+                                if used > flush_at:
+                                    _write_all(out_fd, view[:used])
+                                    used = 0
+                                continue
+                        else:
+                            lengths = receive()
+                            if lengths:
+                                for i, n in enumerate(lengths):
+                                    start = i * packet_size
+                                    view[used : used + n] = packets[
+                                        start : start + n
+                                    ]
+                                    used += n
+                                    if used > flush_at:
+                                        _write_all(out_fd, view[:used])
+                                        used = 0
+                                continue
+
+                        # Nothing queued: wait for the next packet
+                        ready = select.select(wait_for, [], [], 2.0)[0]
+                        if wakeup_fd in ready:
+                            break
+                        if not ready:
+                            # Nothing received for a while: write out what
+                            # we have.
+                            _write_all(out_fd, view[:used])
+                            used = 0
+                    except OSError as e:
+                        if receiver is not None and e.errno == errno.ENOSYS:
+                            # No recvmmsg after all: one packet at a time
+                            receiver = None
+                            continue
+                        self.logger.error("%s: Error: %s", self.process_name, e)
+                        break
                     except Exception as e:
-                        self.logger.error(f"{self.process_name}: Error: {e}")
+                        self.logger.error("%s: Error: %s", self.process_name, e)
                         break
+                _write_all(out_fd, view[:used])
+            except OSError as e:
+                self.logger.error(
+                    "%s: Cannot write to %s: %s",
+                    self.process_name,
+                    self.out_file,
+                    e,
+                )
+            finally:
+                view.release()
+                buf.close()
+                os.close(out_fd)
 
             # Close the socket when done
             self.sock.close()
             self.logger.info(
-                f"{self.process_name}: Listener on port {self.port} closed."
+                "%s: Listener on port %s closed.", self.process_name, self.port
             )
 
         self.thread = threading.Thread(target=listen, daemon=True)
         self.thread.start()
 
-    def stop(self):
+    def stop(self, wait: bool = True):
         """Stop the UDP listener.
 
         Signals the listener to stop and waits for the thread to terminate.
+
+        Parameters
+        ----------
+        - wait : bool, optional
+            If False, only signal the listener and return immediately;
+            call `join()` later to wait for it. Defaults to True.
         """
         self.logger.info(
-            f"{self.process_name}: Stopping listener on port {self.port}..."
+            "%s: Stopping listener on port %s...", self.process_name, self.port
         )
         self.stop_event.set()  # Signal the listener to stop.
+        if self._wakeup is not None:
+            os.write(self._wakeup[1], b"\0")  # Wake the listener up.
+        if wait:
+            self.join()
+
+    def join(self, timeout: float = 2.0):
+        """Wait for the listener thread to terminate.
+
+        Parameters
+        ----------
+        - timeout : float, optional
+            Maximum time to wait in seconds. Defaults to 2.
+        """
         if self.thread:
             # Wait for the thread to terminate.
             self.logger.debug(
-                f"{self.process_name}: Waiting for listener thread to "
-                "terminate..."
+                "%s: Waiting for listener thread to terminate...",
+                self.process_name,
             )
-            self.thread.join(timeout=2)
+            self.thread.join(timeout=timeout)
+        # The wakeup pipe can only go once nothing waits on it anymore
+        if self._wakeup is not None and not (
+            self.thread and self.thread.is_alive()
+        ):
+            for fd in self._wakeup:
+                os.close(fd)
+            self._wakeup = None
 
 
 class USBReader:
@@ -231,6 +663,9 @@ class USBReader:
         The thread running the reader.
     """
 
+    # Maximum number of bytes read from the device at once.
+    READ_SIZE = 128 * 1024
+
     def __init__(
         self,
         device: str,
@@ -260,47 +695,79 @@ class USBReader:
         self.logger = logger or logging.getLogger(__name__)
         self.stop_event = threading.Event()  # To stop the reader.
         self.thread = None  # Thread that will run the reader.
+        # Pipe written to by `stop()` to wake up the reader thread.
+        self._wakeup = None
 
     def start(self):
         """Start the USB reader in a background thread."""
         self.logger.info(
-            f"{self.process_name}: Starting USB reader for device {self.device}, "
-            f"writing to {self.out_file}"
+            "%s: Starting USB reader for device %s, writing to %s",
+            self.process_name,
+            self.device,
+            self.out_file,
         )
+        self.stop_event.clear()
+        self._wakeup = os.pipe()
+        wakeup_fd = self._wakeup[0]
 
         def read_usb():
+            src_fd = out_fd = None
+            # The data is read into the same page-aligned buffer every time
+            buf = mmap.mmap(-1, self.READ_SIZE)
+            view = memoryview(buf)
             try:
-                with open(self.out_file, "wb") as file:
-                    self.logger.debug(
-                        f"{self.process_name}: Reading from {self.device} and "
-                        f"saving to {self.out_file}..."
-                    )
-                    # Use subprocess to read from the USB device
-                    process = subprocess.Popen(
-                        ["cat", self.device],
-                        stdout=file,
-                        stderr=subprocess.PIPE,
+                src_fd = os.open(
+                    self.device, os.O_RDONLY | os.O_NONBLOCK | os.O_CLOEXEC
+                )
+                out_fd = os.open(
+                    self.out_file,
+                    os.O_WRONLY | os.O_CREAT | os.O_TRUNC | os.O_CLOEXEC,
+                    0o644,
+                )
+                self.logger.debug(
+                    "%s: Reading from %s and saving to %s...",
+                    self.process_name,
+                    self.device,
+                    self.out_file,
+                )
+                # Sleep in select() until there is data or `stop()` writes
+                # to the wakeup pipe.
+                wait_for = [src_fd, wakeup_fd]
+                buffers = [buf]
+                while not self.stop_event.is_set():
+                    ready = select.select(wait_for, [], [])[0]
+                    if wakeup_fd in ready:
+                        break
+                    try:
+                        n = os.readv(src_fd, buffers)
+                    except BlockingIOError:
+                        continue
+                    if not n:
+                        # End of file, or the device went away
+                        break
+                    _write_all(out_fd, view[:n])
+                if self.stop_event.is_set():
+                    self.logger.info(
+                        "%s: USB reading stopped.", self.process_name
                     )
-                    while not self.stop_event.is_set():
-                        # Poll the process to check if it's still running
-                        if process.poll() is not None:
-                            break
-                    # Terminate the process if stop_event is set
-                    if self.stop_event.is_set():
-                        process.terminate()
-                        self.logger.info(
-                            f"{self.process_name}: USB reading stopped."
-                        )
             except FileNotFoundError as e:
-                self.logger.error(f"{self.process_name}: Error: {e}")
+                self.logger.error("%s: Error: %s", self.process_name, e)
             except Exception as e:
-                self.logger.error(f"{self.process_name}: Unexpected error: {e}")
+                self.logger.error(
+                    "%s: Unexpected error: %s", self.process_name, e
+                )
+            finally:
+                view.release()
+                buf.close()
+                for fd in (src_fd, out_fd):
+                    if fd is not None:
+                        os.close(fd)
 
         # Start the USB reading in a background thread
         self.thread = threading.Thread(target=read_usb, daemon=True)
         self.thread.start()
         self.logger.info(
-            f"{self.process_name}: USB reader started in the background."
+            "%s: USB reader started in the background.", self.process_name
         )
 
     def stop(self):
@@ -309,13 +776,25 @@ class USBReader:
         Signals the reader to stop and waits for the thread to terminate.
         """
         self.logger.info(
-            f"{self.process_name}: Stopping USB reader for device {self.device}..."
+            "%s: Stopping USB reader for device %s...",
+            self.process_name,
+            self.device,
         )
         self.stop_event.set()  # Signal the reader to stop.
+        if self._wakeup is not None:
+            os.write(self._wakeup[1], b"\0")  # Wake the reader up.
         if self.thread:
             # Wait for the thread to terminate.
             self.logger.debug(
-                f"{self.process_name}: Waiting for USB reader thread to terminate..."
+                "%s: Waiting for USB reader thread to terminate...",
+                self.process_name,
             )
             self.thread.join(timeout=2)
-        self.logger.info(f"{self.process_name}: USB reader stopped.")
+        # The wakeup pipe can only go once nothing waits on it anymore
+        if self._wakeup is not None and not (
+            self.thread and self.thread.is_alive()
+        ):
+            for fd in self._wakeup:
+                os.close(fd)
+            self._wakeup = None
+        self.logger.info("%s: USB reader stopped.", self.process_name)
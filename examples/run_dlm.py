@@ -1,4 +1,6 @@
 import argparse
+import signal
+import threading
 import time
 
 from blackcat.core import BlackCat
@@ -79,11 +81,13 @@ if __name__ == "__main__":
         time.sleep(args.time)
     else:
         print("\nMeasurement running indefinitely. Press Ctrl+C to stop.")
-        try:
-            while True:
-                time.sleep(1)
-        except KeyboardInterrupt:
-            print("\nManual stop triggered. Stopping measurement...")
+        # Block until Ctrl+C (or a termination request) without waking up
+        # in the meantime.
+        stop = threading.Event()
+        signal.signal(signal.SIGINT, lambda *_: stop.set())
+        signal.signal(signal.SIGTERM, lambda *_: stop.set())
+        stop.wait()
+        print("\nManual stop triggered. Stopping measurement...")
 
     # Stop the measurement
     print("\nStopping measurement")
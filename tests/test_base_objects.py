@@ -0,0 +1,12 @@
+"""Tests for blackcat.base_objects."""
+
+from blackcat.base_objects import BaseDevice
+
+
+def test_device_accepts_extra_attributes(tmp_path, monkeypatch):
+    """Device instances can carry extra attributes and be patched."""
+    device = BaseDevice(save_path=str(tmp_path))
+    device.notes = "extra state"
+    assert device.notes == "extra state"
+    monkeypatch.setattr(device, "setup", lambda: "patched")
+    assert device.setup() == "patched"
@@ -0,0 +1,363 @@
+"""Tests for the helpers in blackcat.core."""
+
+import configparser
+import errno
+import json
+import os
+import socket
+import threading
+from pathlib import Path
+
+import pytest
+
+import blackcat.core as core
+from blackcat.core import BlackCat, _count_modules
+from blackcat.utils import get_default_config_path
+
+
+def test_count_modules():
+    """Only module lines are counted, not the header and separator."""
+    output = b"IP-ADDR  MAC\n---  ---\n10.1.1.150  aa\n10.1.1.152  bb\n"
+    assert _count_modules(output) == 2
+
+
+def test_count_modules_skips_blank_lines():
+    """Blank and whitespace-only lines are not modules."""
+    assert _count_modules(b"IP-ADDR\n---\n10.1.1.150\n\n10.1.1.152\n") == 2
+    assert _count_modules(b"IP-ADDR\n---\n10.1.1.150\n   \n") == 1
+
+
+def test_count_modules_empty():
+    """No output, or only the table header, means no modules."""
+    assert _count_modules(b"") == 0
+    assert _count_modules(b"IP-ADDR\n---\n") == 0
+
+
+@pytest.fixture
+def blackcat(tmp_path):
+    """Create a BlackCat device with the default config, without modules."""
+    return BlackCat(save_path=str(tmp_path), dog_modules=False)
+
+
+@pytest.fixture
+def cal_dir(blackcat, tmp_path):
+    """Create the calibration directory, with a raw file for every TDC."""
+    path = tmp_path / blackcat.config["calibration"]["out_dir"]
+    path.mkdir()
+    for tdc_id in blackcat._tdc_ids:
+        (path / f"rc_{tdc_id}").write_text(f"raw {tdc_id}\n")
+    return path
+
+
+@pytest.fixture
+def processed(monkeypatch):
+    """Replace process_raw_cal by a stub; list the raw files it is given."""
+    calls = []
+
+    def process_raw_cal(infile, outfile, verbose=False):
+        calls.append(Path(infile).name)
+        Path(outfile).write_text(Path(infile).read_text())
+
+    monkeypatch.setattr(core, "process_raw_cal", process_raw_cal)
+    return calls
+
+
+def test_calibration_cache_skips_unchanged(blackcat, cal_dir, processed):
+    """Raw files are processed once, and then only when they change."""
+    blackcat.process_raw_calibration()
+    assert processed == ["rc_150", "rc_152", "rc_154"]
+    processed.clear()
+    blackcat.process_raw_calibration()
+    assert processed == []
+    (cal_dir / "rc_152").write_text("new content\n")
+    blackcat.process_raw_calibration()
+    assert processed == ["rc_152"]
+
+
+def test_calibration_cache_rehash_on_mtime_change(
+    blackcat, cal_dir, processed, monkeypatch
+):
+    """A raw file touched without a change is hashed, not processed."""
+    blackcat.process_raw_calibration()
+    processed.clear()
+    hashed = []
+    file_sha256 = core._file_sha256
+    monkeypatch.setattr(
+        core,
+        "_file_sha256",
+        lambda path: hashed.append(Path(path).name) or file_sha256(path),
+    )
+    raw = cal_dir / "rc_150"
+    stat = raw.stat()
+    os.utime(raw, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    blackcat.process_raw_calibration()
+    assert processed == []
+    assert hashed == ["rc_150"]
+    # The new mtime is remembered: no hashing the next time.
+    hashed.clear()
+    blackcat.process_raw_calibration()
+    assert hashed == []
+
+
+def test_calibration_cache_force(blackcat, cal_dir, processed):
+    """With force=True every raw file is processed again."""
+    blackcat.process_raw_calibration()
+    processed.clear()
+    blackcat.process_raw_calibration(force=True)
+    assert processed == ["rc_150", "rc_152", "rc_154"]
+
+
+def test_calibration_cache_version_mismatch(
+    blackcat, cal_dir, processed, monkeypatch
+):
+    """A cache written for another output format is ignored."""
+    blackcat.process_raw_calibration()
+    processed.clear()
+    monkeypatch.setattr(core, "CAL_FORMAT_VERSION", core.CAL_FORMAT_VERSION + 1)
+    blackcat.process_raw_calibration()
+    assert processed == ["rc_150", "rc_152", "rc_154"]
+    cache = json.loads((cal_dir / BlackCat.CAL_CACHE_FILE).read_text())
+    assert cache["version"] == core.CAL_FORMAT_VERSION
+
+
+def test_calibration_cache_corrupt(blackcat, cal_dir, processed):
+    """An unreadable cache is ignored and written again."""
+    blackcat.process_raw_calibration()
+    processed.clear()
+    (cal_dir / BlackCat.CAL_CACHE_FILE).write_text("{not json")
+    blackcat.process_raw_calibration()
+    assert processed == ["rc_150", "rc_152", "rc_154"]
+    processed.clear()
+    blackcat.process_raw_calibration()
+    assert processed == []
+
+
+def test_calibration_cache_missing_raw_file(blackcat, cal_dir, processed):
+    """The files processed before a missing raw file stay cached."""
+    (cal_dir / "rc_152").unlink()
+    with pytest.raises(FileNotFoundError):
+        blackcat.process_raw_calibration()
+    assert processed == ["rc_150", "rc_152"]
+    processed.clear()
+    (cal_dir / "rc_152").write_text("raw 152\n")
+    blackcat.process_raw_calibration()
+    assert processed == ["rc_152", "rc_154"]
+
+
+class FakeTime:
+    """Stand-in for the time module, with a clock advanced by sleep()."""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def monotonic(self):
+        """Return the current time."""
+        return self.now
+
+    def sleep(self, seconds):
+        """Advance the clock instead of waiting."""
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def fake_time(monkeypatch):
+    """Replace the clock used by blackcat.core."""
+    clock = FakeTime()
+    monkeypatch.setattr(core, "time", clock)
+    return clock
+
+
+@pytest.fixture
+def discover(blackcat, monkeypatch):
+    """Replace `dog discover`; its results are taken from a list."""
+    results = []
+    calls = []
+
+    def dog_discover(expected_count, verbose):
+        calls.append(expected_count)
+        return results.pop(0) if results else False
+
+    monkeypatch.setattr(blackcat, "_dog_discover", dog_discover)
+    return results, calls
+
+
+def test_status_cached(blackcat, fake_time, discover):
+    """A status is reused for STATUS_CACHE_TTL seconds."""
+    results, calls = discover
+    results[:] = [True, False]
+    assert blackcat.status(6)
+    fake_time.now += blackcat.STATUS_CACHE_TTL / 2
+    assert blackcat.status(6)
+    assert calls == [6]
+    # Another expected count needs another check
+    assert not blackcat.status(5)
+    assert calls == [6, 5]
+    fake_time.now += blackcat.STATUS_CACHE_TTL
+    assert not blackcat.status(5)
+    assert calls == [6, 5, 5]
+
+
+def test_reboot_backoff(blackcat, fake_time, discover, monkeypatch):
+    """The modules are polled with a growing delay until all are back."""
+    results, calls = discover
+    results[:] = [False, False, False, True]
+    scripts = []
+    monkeypatch.setattr(
+        blackcat, "_run_script", lambda script, **kwargs: scripts.append(script)
+    )
+    monkeypatch.setattr(blackcat, "setup", lambda verbose=False: None)
+    # A long cache lifetime must not hide the recovery of the modules
+    blackcat.STATUS_CACHE_TTL = 60.0
+    blackcat.reboot()
+    assert len(scripts) == 1
+    assert len(calls) == 4
+    assert fake_time.sleeps == pytest.approx(
+        [blackcat.REBOOT_SETTLE_TIME, 0.1, 0.15, 0.225]
+    )
+
+
+def test_reboot_gives_up(blackcat, fake_time, discover, monkeypatch):
+    """After max_retry ping of deaths without recovery, an error is raised."""
+    scripts = []
+    monkeypatch.setattr(
+        blackcat, "_run_script", lambda script, **kwargs: scripts.append(script)
+    )
+    setups = []
+    monkeypatch.setattr(
+        blackcat, "setup", lambda verbose=False: setups.append(1)
+    )
+    with pytest.raises(RuntimeError, match="after 2 attempts"):
+        blackcat.reboot(max_retry=2)
+    assert len(scripts) == 2
+    assert setups == []
+    delays = [s for s in fake_time.sleeps if s != blackcat.REBOOT_SETTLE_TIME]
+    assert max(delays) == 2.0
+    # The last poll of each attempt is at the end of the recovery time
+    assert fake_time.now == pytest.approx(
+        1000.0
+        + 2 * (blackcat.REBOOT_SETTLE_TIME + blackcat.REBOOT_RECOVERY_TIMEOUT)
+    )
+
+
+def _free_ports(n):
+    """Return n UDP ports that are currently free."""
+    sockets = [
+        socket.socket(socket.AF_INET, socket.SOCK_DGRAM) for _ in range(n)
+    ]
+    for sock in sockets:
+        sock.bind(("0.0.0.0", 0))
+    ports = [sock.getsockname()[1] for sock in sockets]
+    for sock in sockets:
+        sock.close()
+    return ports
+
+
+@pytest.fixture
+def udp_blackcat(tmp_path):
+    """Create a BlackCat device listening on free ports."""
+    config = configparser.ConfigParser()
+    config.read(get_default_config_path())
+    config["run"]["ports"] = " ".join(map(str, _free_ports(3)))
+    config_file = tmp_path / "config.cfg"
+    with open(config_file, "w") as f:
+        config.write(f)
+    return BlackCat(
+        str(config_file), save_path=str(tmp_path), dog_modules=False
+    )
+
+
+class FakeListener:
+    """UDPListener stand-in that never gets ready."""
+
+    instances = []
+
+    def __init__(self, port, out_file, logger=None, process_name=""):
+        self.port = port
+        self.ready_event = threading.Event()
+        self.error = None
+        self.stopped = False
+        self.joined = False
+        FakeListener.instances.append(self)
+
+    def start(self):
+        """Do not set up anything."""
+
+    def stop(self, wait=True):
+        """Record the stop request."""
+        self.stopped = True
+
+    def join(self):
+        """Record the join."""
+        self.joined = True
+
+
+@pytest.fixture
+def fake_listeners(monkeypatch):
+    """Replace UDPListener by FakeListener; list the instances created."""
+    monkeypatch.setattr(core, "UDPListener", FakeListener)
+    monkeypatch.setattr(FakeListener, "instances", [])
+    return FakeListener.instances
+
+
+def test_start_udp_listeners(udp_blackcat):
+    """Every port gets a listener, keyed by the port from the config."""
+    ports = udp_blackcat.config["run"]["ports"].split()
+    udp_blackcat.start_udp_listeners(outfile_suffix="test")
+    try:
+        assert list(udp_blackcat.listeners) == ports
+        for listener in udp_blackcat.listeners.values():
+            assert listener.error is None
+            assert listener.out_file.endswith("_test.bin")
+    finally:
+        for listener in udp_blackcat.listeners.values():
+            listener.stop()
+
+
+def test_start_udp_listeners_timeout(udp_blackcat, fake_listeners):
+    """Listeners that are not ready in time are all stopped."""
+    udp_blackcat.LISTENER_READY_TIMEOUT = 0.05
+    with pytest.raises(RuntimeError, match="not ready"):
+        udp_blackcat.start_udp_listeners()
+    assert udp_blackcat.listeners is None
+    assert len(fake_listeners) == 3
+    assert all(fake.stopped and fake.joined for fake in fake_listeners)
+
+
+def test_start_udp_listeners_start_error(
+    udp_blackcat, fake_listeners, monkeypatch
+):
+    """An error starting a listener stops the ones already started."""
+
+    def start(self):
+        if len([fake for fake in fake_listeners if fake.started]) == 1:
+            raise OSError("cannot open the output file")
+        self.started = True
+
+    monkeypatch.setattr(FakeListener, "started", False, raising=False)
+    monkeypatch.setattr(FakeListener, "start", start)
+    with pytest.raises(OSError, match="output file"):
+        udp_blackcat.start_udp_listeners()
+    assert udp_blackcat.listeners is None
+    assert all(fake.stopped and fake.joined for fake in fake_listeners)
+
+
+def test_start_udp_listeners_port_in_use(udp_blackcat):
+    """A port in use raises the bind error; a later start works."""
+    port = int(udp_blackcat.config["run"]["ports"].split()[1])
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        sock.bind(("0.0.0.0", port))
+        with pytest.raises(OSError) as excinfo:
+            udp_blackcat.start_udp_listeners()
+        assert excinfo.value.errno == errno.EADDRINUSE
+        assert udp_blackcat.listeners is None
+
+    udp_blackcat.start_udp_listeners()
+    listeners = udp_blackcat.listeners
+    for listener in listeners.values():
+        listener.stop()
+    assert all(listener.error is None for listener in listeners.values())
+    assert not any(
+        listener.thread.is_alive() for listener in listeners.values()
+    )
@@ -0,0 +1,307 @@
+"""Regression tests for blackcat.data_processing.
+
+The expected outputs in `data/` were produced by the original
+implementation of these functions, before they were vectorized.
+"""
+
+import io
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+import blackcat.data_processing as dp
+
+DATA = Path(__file__).parent / "data"
+
+# Arguments of decode_usb_tdc for the fixture files
+USB_ARGS = {"dlm_period_ns": 10_000_000, "max_diff_ns": 2_000}
+
+
+@pytest.fixture(params=["numba", "python"])
+def backend(request, monkeypatch):
+    """Run a test with the Numba kernels and again in plain Python."""
+    if request.param == "numba":
+        if dp.njit is None:
+            pytest.skip("Numba is not installed")
+        return
+    if dp.njit is not None:
+        monkeypatch.setattr(dp, "njit", None)
+        for name, value in list(vars(dp).items()):
+            if hasattr(value, "py_func"):
+                monkeypatch.setattr(dp, name, value.py_func)
+
+
+def read(name: str) -> str:
+    """Return the content of a fixture file."""
+    return (DATA / name).read_text()
+
+
+def test_process_raw_cal(tmp_path):
+    """The calibration file matches the original output."""
+    outfile = tmp_path / "cal.txt"
+    dp.process_raw_cal(str(DATA / "raw_cal.txt"), str(outfile))
+    assert outfile.read_text() == read("cal.txt")
+
+
+def test_process_raw_cal_last_entry_wins(tmp_path):
+    """A bin listed more than once takes the entries of its last line."""
+    infile = tmp_path / "raw.txt"
+    infile.write_text("0x00100005\n0x00100007\n0x00200003\n0x00100002\n")
+    outfile = tmp_path / "cal.txt"
+    dp.process_raw_cal(str(infile), str(outfile))
+    entries = dp.load_calibration_file(str(outfile))["ENTRIES"]
+    assert entries[:4].tolist() == [0, 2, 3, 0]
+    assert entries.sum() == 5
+
+
+def test_process_raw_cal_empty(tmp_path):
+    """An empty raw file gives an empty histogram."""
+    infile = tmp_path / "raw.txt"
+    infile.write_text("")
+    outfile = tmp_path / "cal.txt"
+    dp.process_raw_cal(str(infile), str(outfile))
+    assert outfile.read_text().startswith(
+        f"# SUM          0 {dp.FT_UNIT:10.5f} 0.00000e+00\n"
+    )
+    assert not dp.load_calibration_file(str(outfile))["ENTRIES"].any()
+
+
+def test_load_calibration_file():
+    """The columns are loaded as the fields of a structured array."""
+    cal = dp.load_calibration_file(str(DATA / "cal.txt"))
+    assert cal.dtype.names == (
+        "BIN",
+        "ENTRIES",
+        "BIN_WIDTH",
+        "BIN_CENTER",
+        "BIN_SUM",
+    )
+    assert len(cal) == dp.BLOCK_RAM_SIZE
+    table = np.loadtxt(DATA / "cal.txt", skiprows=3)
+    for i, name in enumerate(cal.dtype.names):
+        np.testing.assert_array_equal(cal[name], table[:, i])
+
+
+def test_load_calibration_file_wrong_columns(tmp_path):
+    """A file with other columns is rejected."""
+    cal_file = tmp_path / "cal.txt"
+    cal_file.write_text(read("cal.txt").replace("BIN_SUM", "TOTAL"))
+    with pytest.raises(ValueError, match="Expected columns"):
+        dp.load_calibration_file(str(cal_file))
+
+
+def test_load_calibration_file_wrong_bins(tmp_path):
+    """A file with a missing bin is rejected."""
+    cal_file = tmp_path / "cal.txt"
+    cal_file.write_text("".join(read("cal.txt").splitlines(True)[:-1]))
+    with pytest.raises(ValueError):
+        dp.load_calibration_file(str(cal_file))
+
+
+@pytest.mark.parametrize("name", ["dlm", "dlm_truncated", "dlm_mismatch"])
+def test_unpack_dlm_data(tmp_path, backend, name):
+    """Valid, truncated and malformed DLM data unpack as originally."""
+    outfile = tmp_path / "out.txt"
+    dp.unpack_dlm_data(
+        str(DATA / "cal.txt"), str(DATA / f"{name}.bin"), outfile=str(outfile)
+    )
+    assert outfile.read_text() == read(f"{name}.expected")
+
+
+def test_unpack_dlm_data_stdout(capsys):
+    """Without an output file, the hits are printed."""
+    dp.unpack_dlm_data(str(DATA / "cal.txt"), str(DATA / "dlm.bin"))
+    assert capsys.readouterr().out == read("dlm.expected")
+
+
+def test_unpack_dlm_data_verbose(tmp_path, capsys, backend):
+    """The verbose messages, including the warnings, are unchanged."""
+    outfile = tmp_path / "out.txt"
+    dp.unpack_dlm_data(
+        str(DATA / "cal.txt"),
+        str(DATA / "dlm_truncated.bin"),
+        outfile=str(outfile),
+        verbose=True,
+    )
+    stdout = capsys.readouterr().out
+    stdout = stdout.replace(str(DATA), "DATA").replace(str(outfile), "OUT")
+    assert stdout == read("dlm_verbose.stdout")
+
+
+def test_unpack_dlm_data_chunked(tmp_path, monkeypatch, backend):
+    """Records split across chunks are decoded as in a single chunk."""
+    monkeypatch.setattr(dp, "_DLM_CHUNK", 7)
+    outfile = tmp_path / "out.txt"
+    dp.unpack_dlm_data(
+        str(DATA / "cal.txt"),
+        str(DATA / "dlm_truncated.bin"),
+        outfile=str(outfile),
+    )
+    assert outfile.read_text() == read("dlm_truncated.expected")
+
+
+def test_unpack_dlm_files(tmp_path):
+    """Several files unpacked together give the same outputs."""
+    names = ["dlm", "dlm_truncated", "dlm_mismatch"]
+    outfiles = [str(tmp_path / f"{name}.txt") for name in names]
+    dp.unpack_dlm_files(
+        str(DATA / "cal.txt"),
+        [str(DATA / f"{name}.bin") for name in names],
+        outfiles,
+        max_workers=2,
+    )
+    for name, outfile in zip(names, outfiles):
+        assert Path(outfile).read_text() == read(f"{name}.expected")
+
+
+def test_unpack_dlm_files_mismatch():
+    """Each input file needs an output file."""
+    with pytest.raises(ValueError):
+        dp.unpack_dlm_files(str(DATA / "cal.txt"), ["a", "b"], ["a.txt"])
+
+
+@pytest.mark.parametrize(("skip", "name"), [(0, "usb"), (3, "usb_skip")])
+def test_decode_usb_tdc(tmp_path, backend, skip, name):
+    """USB TDC data decodes as originally."""
+    outfile = tmp_path / "out.txt"
+    dp.decode_usb_tdc(
+        str(DATA / "usb.bin"),
+        skip_events=skip,
+        outfile=str(outfile),
+        **USB_ARGS,
+    )
+    assert outfile.read_text() == read(f"{name}.expected")
+
+
+def test_decode_usb_tdc_stdout(capsys):
+    """Without an output file, the lines are printed."""
+    dp.decode_usb_tdc(str(DATA / "usb.bin"), **USB_ARGS)
+    assert capsys.readouterr().out == read("usb.expected")
+
+
+def test_decode_usb_tdc_verbose(tmp_path, capsys, backend):
+    """The verbose messages are unchanged."""
+    outfile = tmp_path / "out.txt"
+    dp.decode_usb_tdc(
+        str(DATA / "usb.bin"), outfile=str(outfile), verbose=True, **USB_ARGS
+    )
+    assert capsys.readouterr().out == read("usb_verbose.stdout")
+    assert outfile.read_text() == read("usb.expected")
+
+
+def test_decode_usb_tdc_chunked(tmp_path, monkeypatch, backend):
+    """Blocks split across chunks are decoded as in a single chunk."""
+    monkeypatch.setattr(dp, "_USB_CHUNK", 5)
+    outfile = tmp_path / "out.txt"
+    dp.decode_usb_tdc(str(DATA / "usb.bin"), outfile=str(outfile), **USB_ARGS)
+    assert outfile.read_text() == read("usb.expected")
+
+
+@pytest.mark.parametrize(
+    ("name", "message"),
+    [
+        ("usb_bad_fine", "Invalid fine time."),
+        ("usb_bad_channel", "Broken channel: 0x9000000000"),
+    ],
+)
+def test_decode_usb_tdc_malformed(tmp_path, backend, name, message):
+    """Malformed data words raise an error."""
+    with pytest.raises(ValueError, match=message):
+        dp.decode_usb_tdc(
+            str(DATA / f"{name}.bin"),
+            outfile=str(tmp_path / "out.txt"),
+            **USB_ARGS,
+        )
+
+
+def test_decode_usb_tdc_empty(tmp_path, capsys):
+    """A file with only the header gives no output."""
+    infile = tmp_path / "usb.bin"
+    infile.write_bytes(dp.MESSAGE_OK.to_bytes(4, "big"))
+    dp.decode_usb_tdc(str(infile), **USB_ARGS)
+    assert capsys.readouterr().out == ""
+
+
+@pytest.mark.parametrize(
+    ("name", "expected"),
+    [
+        ("dlm_hits", "dlm_average"),
+        ("dlm_hits_bad", "dlm_average_bad"),
+    ],
+)
+def test_average_dlm_data(tmp_path, name, expected):
+    """Fine times average as originally."""
+    outfile = tmp_path / "out.txt"
+    dp.average_dlm_data(
+        3, infile=str(DATA / f"{name}.txt"), outfile=str(outfile), n_channels=4
+    )
+    assert outfile.read_text() == read(f"{expected}.expected")
+
+
+def test_average_dlm_data_invalid():
+    """The number of hits per mean must be positive."""
+    with pytest.raises(ValueError):
+        dp.average_dlm_data(0, infile=str(DATA / "dlm_hits.txt"))
+
+
+def test_average_usb_tdc_data(tmp_path):
+    """Time differences average as originally."""
+    outfile = tmp_path / "out.txt"
+    dp.average_usb_tdc_data(
+        4, infile=str(DATA / "usb.expected"), outfile=str(outfile)
+    )
+    assert outfile.read_text() == read("usb_average.expected")
+
+
+def test_average_usb_tdc_data_invalid():
+    """The number of events per mean must be positive."""
+    with pytest.raises(ValueError):
+        dp.average_usb_tdc_data(0, infile=str(DATA / "usb.expected"))
+
+
+def test_read_longwords(tmp_path):
+    """All the readers agree, from the current position on."""
+    data = (DATA / "dlm_truncated.bin").read_bytes()
+    path = tmp_path / "data.bin"
+    path.write_bytes(data)
+    expected = [
+        int.from_bytes(data[i : i + 4], "big")
+        for i in range(8, len(data) - 3, 4)
+    ]
+    with open(path, "rb") as f:
+        f.seek(8)
+        assert list(dp.read_longwords(f)) == expected
+    with open(path, "rb") as f:
+        f.seek(8)
+        assert dp.read_longwords_bulk(f).tolist() == expected
+        assert f.tell() == len(data)
+    stream = io.BytesIO(data)
+    stream.seek(8)
+    assert dp.read_longwords_bulk(stream).tolist() == expected
+
+
+def test_read_longwords_truncated_later(tmp_path):
+    """The words stay valid if the file is truncated after reading it."""
+    path = tmp_path / "data.bin"
+    path.write_bytes(bytes(range(64)))
+    with open(path, "rb") as f:
+        words = dp.read_longwords_bulk(f)
+    with open(path, "wb"):
+        pass
+    assert words[-1] == 0x3C3D3E3F
+
+
+def test_read_40bit_words(tmp_path):
+    """40-bit words are unpacked big-endian; stray bytes are ignored."""
+    data = bytes(range(1, 11)) + b"\xff\xfe"
+    path = tmp_path / "data.bin"
+    path.write_bytes(data)
+    expected = [0x0102030405, 0x060708090A]
+    with open(path, "rb") as f:
+        assert dp.read_40bit_words_bulk(f).tolist() == expected
+    assert dp.read_40bit_words_bulk(io.BytesIO(data)).tolist() == expected
+    with open(tmp_path / "empty.bin", "wb"):
+        pass
+    with open(tmp_path / "empty.bin", "rb") as f:
+        assert dp.read_40bit_words_bulk(f).tolist() == []
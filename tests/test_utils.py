@@ -0,0 +1,139 @@
+"""Tests for the helpers in blackcat.utils."""
+
+import configparser
+import logging
+import random
+import socket
+import time
+from pathlib import Path
+
+import pytest
+
+import blackcat.utils
+from blackcat.utils import (
+    UDPListener,
+    _load_config,
+    get_default_config_path,
+    run_shell_script,
+)
+
+_RMEM_MAX = Path("/proc/sys/net/core/rmem_max")
+
+
+def test_load_config_cached(tmp_path):
+    """A configuration file is parsed again only once it is modified."""
+    path = tmp_path / "config.cfg"
+    path.write_text("[run]\nports = 22222 22223\n")
+    mtime_ns = path.stat().st_mtime_ns
+    config = _load_config(str(path), mtime_ns)
+    assert isinstance(config, configparser.ConfigParser)
+    assert config["run"]["ports"] == "22222 22223"
+    assert _load_config(str(path), mtime_ns) is config
+
+    path.write_text("[run]\nports = 22224\n")
+    reloaded = _load_config(str(path), mtime_ns + 1)
+    assert reloaded is not config
+    assert reloaded["run"]["ports"] == "22224"
+
+
+def test_load_config_packaged():
+    """The packaged configuration file parses as with ConfigParser.read."""
+    path = get_default_config_path()
+    expected = configparser.ConfigParser()
+    expected.read(path)
+    config = _load_config(str(path), path.stat().st_mtime_ns)
+    assert {name: dict(config[name]) for name in config.sections()} == {
+        name: dict(expected[name]) for name in expected.sections()
+    }
+
+
+def test_run_shell_script_logs_lines(tmp_path, caplog):
+    """Every output line is its own record, even if written in pieces."""
+    script = tmp_path / "script.sh"
+    script.write_text(
+        "#!/bin/sh\n"
+        "printf 'first\\nsec'\n"
+        "sleep 0.1\n"
+        "printf 'ond\\nlast'\n"
+        "echo oops >&2\n"
+    )
+    script.chmod(0o755)
+    with caplog.at_level(logging.DEBUG, logger="blackcat.utils"):
+        run_shell_script(str(script), process_name="TEST")
+    messages = [
+        (record.levelno, record.getMessage())
+        for record in caplog.records
+        if "Running script" not in record.getMessage()
+    ]
+    assert sorted(messages) == [
+        (logging.DEBUG, "TEST: first"),
+        (logging.DEBUG, "TEST: last"),
+        (logging.DEBUG, "TEST: second"),
+        (logging.ERROR, "TEST ERROR: oops"),
+    ]
+
+
+def _start_listener(tmp_path, **kwargs):
+    listener = UDPListener(0, str(tmp_path / "out.bin"), **kwargs)
+    listener.start()
+    assert listener.ready_event.wait(5)
+    assert listener.error is None
+    return listener
+
+
+@pytest.mark.skipif(not _RMEM_MAX.exists(), reason="Linux only")
+def test_udp_receive_buffer_capped(tmp_path, caplog):
+    """A receive buffer above net.core.rmem_max is reported.
+
+    The request is below twice the cap, which is what Linux reports back.
+    """
+    rmem_max = int(_RMEM_MAX.read_text())
+    with caplog.at_level(logging.WARNING, logger="blackcat.utils"):
+        listener = _start_listener(tmp_path, rcvbuf=rmem_max * 3 // 2)
+        listener.stop()
+    assert "Raise net.core.rmem_max" in caplog.text
+
+
+def test_udp_receive_buffer_granted(tmp_path, caplog):
+    """A small receive buffer is granted without a warning."""
+    with caplog.at_level(logging.WARNING, logger="blackcat.utils"):
+        listener = _start_listener(tmp_path, rcvbuf=64 * 1024)
+        listener.stop()
+    assert "Raise net.core.rmem_max" not in caplog.text
+
+
+def test_udp_receive_buffer_default(tmp_path, caplog):
+    """By default the system receive buffer is kept, without a warning."""
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        default = sock.getsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF)
+    with caplog.at_level(logging.DEBUG, logger="blackcat.utils"):
+        listener = _start_listener(tmp_path)
+        assert (
+            listener.sock.getsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF)
+            == default
+        )
+        listener.stop()
+    assert "Receive buffer" not in caplog.text
+
+
+@pytest.mark.parametrize("batched", [True, False])
+def test_udp_listener_writes_packets(tmp_path, monkeypatch, batched):
+    """All packets end up in the output file, in order, back to back."""
+    if not batched:
+        monkeypatch.setattr(blackcat.utils, "_recvmmsg", None)
+    elif blackcat.utils._recvmmsg is None:
+        pytest.skip("recvmmsg is not available")
+    # The packets are sent in one burst, which the default receive buffer
+    # may not hold.
+    listener = _start_listener(tmp_path, rcvbuf=4 * 1024 * 1024)
+    port = listener.sock.getsockname()[1]
+    rng = random.Random(1)
+    sizes = [1, 100, 1400, UDPListener.PACKET_SIZE] * 100
+    packets = [rng.randbytes(size) for size in sizes]
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        for packet in packets:
+            sock.sendto(packet, ("127.0.0.1", port))
+    time.sleep(0.2)
+    listener.stop()
+    assert not listener.thread.is_alive()
+    assert (tmp_path / "out.bin").read_bytes() == b"".join(packets)